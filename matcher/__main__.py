@@ -1,81 +1,103 @@
 import asyncio
-import logging
 from datetime import datetime, timedelta
-from typing import List
-import json
+from typing import List, Dict
 
-import redis
 import asyncpg
 from aiogram import Bot
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from asyncpg import Connection
+from asyncpg import Pool
+from redis.asyncio import Redis
 
-from matcher.opb_model.OpbTask import OpbTask
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.IncrementalMatcher import IncrementalMatcher
+from matcher.opb_model.pair_cache import PairCache
+from matcher.opb_model.parallel_solver import solve_by_components
 from matcher.configs.general_bot_config import DB_NAME, DB_USER, DB_HOST, DB_PASSWORD, DB_PORT, BOT_TOKEN, REDIS_DP, \
-    REDIS_PASSWORD, REDIS_PORT, REDIS_HOST
-from matcher.configs.log_config import LOG_LEVEL, LOG_FILEMODE, LOG_FILENAME, LOG_FORMAT
+    REDIS_PASSWORD, REDIS_PORT, REDIS_HOST, SOLVER, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_STATEMENT_CACHE_SIZE, \
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME, DB_HEALTH_CHECK_TIMEOUT, NOTIFICATION_CONCURRENCY, NOTIFICATION_GLOBAL_RATE, \
+    NOTIFICATION_PER_CHAT_RATE, NOTIFICATION_MAX_RETRIES, BOT_CONNECTIONS_LIMIT, BOT_REQUEST_TIMEOUT, \
+    REDIS_MAX_CONNECTIONS, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS, \
+    MATCHER_WORKERS, MATCHER_TIME_LIMIT, MATCHER_GAP_LIMIT, MATCHER_SOLVER_GRACE, MATCHER_INCREMENTAL, \
+    MATCHER_SYNC_INTERVAL, MATCHER_REBUILD_AFTER, MATCHER_PAIR_CACHE_FILE, MATCHER_PAIR_CACHE_MAX_AGE_DAYS, \
+    METRICS_PROMETHEUS_FILE, METRICS_RUNS_FILE
 from matcher.models.Criterion import Criterion, MeetingFormat
 from matcher.models.Group import Group
+from matcher.models.MatchingFeatures import MatchingFeatures
 from matcher.models.MyUser import MyUser, Role
+from matcher.models.Notification import Notification, NotificationKind
 from matcher.models.WorkPlace import WorkPlace
 from matcher.repositorys.criterion_repo import CriterionRepo
 from matcher.repositorys.group_repo import GroupRepo
+from matcher.repositorys.matching_features_repo import MatchingFeaturesRepo
 from matcher.repositorys.meetings_repo import MeetingRepo
+from matcher.repositorys.notification_outbox_repo import NotificationOutboxRepo
 from matcher.repositorys.start_next_matching_algo_repo import NextMatchingRepo
 from matcher.repositorys.users_repo import UserRepo
 from matcher.repositorys.waiting_companions import WaitingCompanionRepo
 from matcher.repositorys.work_place import WorkPlaceRepo
-from matcher.utils.BotLogger import BotLogger
-from matcher.utils.delete_button import delete_button_on_previous_message
-from matcher.utils.save_message import save_sending_message_attribute
+from matcher.utils.BotLogger import BotLogger, alerts
+from matcher.utils.fsm_storage import FsmStorage
+from matcher.utils.log_setup import setup_logging
+from matcher.utils.met_pairs_index import MetPairsIndex
+from matcher.utils.notification_dispatcher import NotificationDispatcher
+from matcher.utils.outbox_worker import OutboxWorker
+from matcher.utils.run_metrics import RunMetrics, MetricsExporter
 
-logging.basicConfig(
-    level=LOG_LEVEL,
-    filename=LOG_FILENAME,
-    filemode=LOG_FILEMODE,
-    format=LOG_FORMAT)
+setup_logging()
 
 logger = BotLogger(name=__name__, extra=None, with_user_info=False)
 
 
-async def get_postgres_connection():
-    return await asyncpg.connect(
-        dsn=f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}')
+async def create_postgres_pool() -> Pool:
+    return await asyncpg.create_pool(
+        dsn=f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}',
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+        max_inactive_connection_lifetime=DB_MAX_INACTIVE_CONNECTION_LIFETIME)
 
 
-async def get_redis_connection():
-    return redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DP, password=REDIS_PASSWORD, decode_responses=True)
+async def check_postgres_pool(pool: Pool):
+    # Проверяем, что база доступна, до начала матчинга, а не посреди рассылки
+    await pool.fetchval('SELECT 1', timeout=DB_HEALTH_CHECK_TIMEOUT)
 
 
-async def get_next_matching_date():
-    connection: Connection = await get_postgres_connection()
-    next_matching: datetime = await NextMatchingRepo(connection).next_matching()
-    await connection.close()
-    return next_matching
+def create_redis() -> Redis:
+    # Клиент держит собственный пул соединений, создаём его один раз на процесс
+    return Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DP, password=REDIS_PASSWORD, decode_responses=True,
+                 max_connections=REDIS_MAX_CONNECTIONS)
 
 
-async def get_homies(connection, t_user_id):
-    rows = await connection.fetch(
-        f"SELECT meetings.t_user_id as t_user_id FROM feedbacks LEFT JOIN meetings on feedbacks.meeting_id=meetings.id WHERE is_meeting_took_place=true and feedbacks.t_user_id={t_user_id}")
-    return [row['t_user_id'] for row in rows]
+async def get_next_matching_date(pool: Pool):
+    async with pool.acquire() as connection:
+        return await NextMatchingRepo(connection).next_matching()
 
 
-async def get_waiting_companions(connection, next_matching):
-    t_user_ids: List[int] = await WaitingCompanionRepo(connection).get_all_users_in_queue_less_time(next_matching)
-    user_repo: UserRepo = UserRepo(connection)
-    criterion_repo: CriterionRepo = CriterionRepo(connection)
-    group_repo: GroupRepo = GroupRepo(connection)
-    work_repo: WorkPlaceRepo = WorkPlaceRepo(connection)
+async def get_waiting_companions(connection, met_pairs: MetPairsIndex, next_matching) -> Dict[int, MatchingFeatures]:
+    # Очередь - один запрос к waiting_companions и matching_features, без разбора профилей
+    features_repo = MatchingFeaturesRepo(connection)
+    await features_repo.refresh_missing(next_matching)
+    await met_pairs.refresh(connection)
+    return {features.t_user_id: features
+            for features in await features_repo.get_queue_features(next_matching, met_pairs.homies)}
+
+
+async def get_profiles(connection, t_user_ids: List[int]) -> Dict[int, dict]:
+    # Профили нужны только для текстов уведомлений, грузятся фиксированным числом запросов
+    users_by_id: Dict[int, MyUser] = {
+        user.t_user_id: user for user in await UserRepo(connection).get_by_t_user_ids(t_user_ids)}
+    criterions: Dict[int, Criterion] = {
+        criterion.t_user_id: criterion
+        for criterion in await CriterionRepo(connection).get_criterions_by_t_user_ids(t_user_ids)}
+    groups: Dict[int, List[Group]] = await GroupRepo(connection).get_groups_by_t_user_ids(t_user_ids)
+    works: Dict[int, List[WorkPlace]] = await WorkPlaceRepo(connection).get_work_places_by_t_user_ids(t_user_ids)
 
     users = dict()
 
     for t_user_id in t_user_ids:
-        user: MyUser = await user_repo.get_by_t_user_id(t_user_id)
-        criterion: Criterion = await criterion_repo.get_criterion_by_t_user_id(t_user_id)
-        groups: List[Group] = await group_repo.get_group_by_t_user_id(t_user_id)
-        works: List[WorkPlace] = await work_repo.get_work_place_by_t_user_id(t_user_id)
-        homies: List[int] = await get_homies(connection, t_user_id)
-        users[t_user_id] = {"user": user, "criterion": criterion, "groups": groups, "works": works, "homies": homies}
+        users[t_user_id] = {"user": users_by_id.get(t_user_id),
+                            "criterion": criterions.get(t_user_id),
+                            "groups": groups.get(t_user_id, []),
+                            "works": works.get(t_user_id, [])}
     return users
 
 
@@ -91,43 +113,12 @@ def timestamp_to_week_day(timestamp: datetime):
     # Используем список calendar.day_name для получения названия дня недели на основе номера
     return day_name[weekday_num]
 
-async def get_fsm(redis_conn, free_user):
-    data = redis_conn.get(f'fsm:{free_user}:{free_user}:data')
-    state = redis_conn.get(f'fsm:{free_user}:{free_user}:state')
-    return data, state
-
-async def delete_and_change_state_message(bot, message, free_user, new_state: str):
-    redis_conn = await get_redis_connection()
-    data, state = await get_fsm(redis_conn, free_user)
-    json_data = json.loads(data)
-    await delete_button_on_previous_message(bot, json_data)
-    json_data = await save_sending_message_attribute(message, json_data)
-    redis_conn.set(f'fsm:{free_user}:{free_user}:data', json.dumps(json_data))
-    redis_conn.set(f'fsm:{free_user}:{free_user}:state', new_state)
-    redis_conn.close()
-
-async def apologize_for_mismatching(free_users: List[int], new_next_matching):
-    edit_profile_buttons = InlineKeyboardMarkup()
-    edit_profile_buttons.add(InlineKeyboardButton(text="Редактировать профиль", callback_data='edit_profile'))
-
-    for free_user in free_users:
-        bot = Bot(token=BOT_TOKEN)
-        message = "К сожалению, на этот раз не получилось найти подходящего собеседника. 😔 Но не переживай! Следующий матчинг будет: {matching_date}"
-        message = message.format(matching_date=new_next_matching.strftime("%Y-%m-%d"))
-        conn = await get_postgres_connection()
-        try:
-            async with conn.transaction():
-                await WaitingCompanionRepo(conn).upsert_user_in_queue(free_user, new_next_matching)
-                message = await bot.send_message(free_user, message, reply_markup=edit_profile_buttons)
-                await asyncio.sleep(5)
-                await delete_and_change_state_message(bot, message, free_user, "ReadyStates:add_to_queue")
-        except Exception as e:
-            await logger.print_error(f"apologize_for_mismatching: error with user {free_user}: {str(e)}")
-        finally:
-            await conn.close()
+def render_mismatch_message(new_next_matching) -> str:
+    message = "К сожалению, на этот раз не получилось найти подходящего собеседника. 😔 Но не переживай! Следующий матчинг будет: {matching_date}"
+    return message.format(matching_date=new_next_matching.strftime("%Y-%m-%d"))
 
 
-async def ping_user(bot: Bot, t_user_id: int, user_info: dict):
+def render_match_message(user_info: dict) -> str:
     message = "Я Нашел тебе напарника! Это *{name}*\n*Пол*: {sex}\n*{direction_name}*: {direction}\n*О себе*: {info}\n*Интересы:* {interests}\n*Формат встречи: * {meeting_format}\n Напиши напарнику в [телеграм](https://t.me/{user_name}), и договоритесь о времени встречи или видеозвонка.\n\nВы можете устроить онлайн-встречу или запланировать совместный кофе-брейк ☕️\n"
 
     if user_info['criterion'].meeting_format != MeetingFormat.ONLINE:
@@ -138,7 +129,7 @@ async def ping_user(bot: Bot, t_user_id: int, user_info: dict):
     if my_user.role == Role.STUDENT:
         groups: List[Group] = user_info['groups']
 
-        send_message = message.format(
+        return message.format(
             name=my_user.full_name,
             sex=my_user.sex.value,
             direction_name="Факультет",
@@ -149,7 +140,7 @@ async def ping_user(bot: Bot, t_user_id: int, user_info: dict):
             user_name=my_user.user_name)
     else:
         work_places: List[WorkPlace] = user_info['works']
-        send_message = message.format(
+        return message.format(
             name=my_user.full_name,
             sex=my_user.sex.value,
             direction_name="Отдел",
@@ -159,93 +150,200 @@ async def ping_user(bot: Bot, t_user_id: int, user_info: dict):
             meeting_format=user_info['criterion'].meeting_format.value,
             user_name=my_user.user_name)
 
-    # TODO тут была проблемма со смайликами, пришлось их удалить
-    await bot.send_message(
-        t_user_id,
-        send_message,
-        parse_mode='Markdown')
-
-    advise_message = "Если не знаешь, что написать собеседнику, то отправь это сообщение:\n\nПривет!\nБот @itmoffee_bot сказал, что мы коллеги. Удобно договориться о встрече сегодня или завтра?"
-
-    start_approve_button = InlineKeyboardMarkup()
-    start_approve_button.add(InlineKeyboardButton(text='Супер, понятно', callback_data='confirm'))
 
-    return await bot.send_message(
-        t_user_id,
-        advise_message,
-        reply_markup=start_approve_button)
-
-async def ping_user_and_delete(bot, user, users2_dict):
-    conn = await get_postgres_connection()
-    try:
+def get_notifications(free_users: List[int], matching, meeting_ids: List[int], new_next_matching,
+                      users) -> List[Notification]:
+    notifications = [
+        Notification(t_user_id=free_user,
+                     kind=NotificationKind.MISMATCHED,
+                     text=render_mismatch_message(new_next_matching),
+                     new_state="ReadyStates:add_to_queue")
+        for free_user in free_users]
+    for (user1, user2), meeting_id in zip(matching, meeting_ids):
+        for user, companion in ((user1, user2), (user2, user1)):
+            notifications.append(Notification(t_user_id=user,
+                                              kind=NotificationKind.MATCHED,
+                                              text=render_match_message(users[companion]),
+                                              new_state="ApproveStates:approve",
+                                              meeting_id=meeting_id))
+    return notifications
+
+
+async def commit_matching(pool: Pool, metrics: RunMetrics, free_users: List[int], matching,
+                          new_next_matching) -> List[int]:
+    # Результат матчинга и все уведомления о нём фиксируются в базе в одной транзакции,
+    # рассылкой занимается OutboxWorker
+    matched_users = [user for pair in matching for user in pair]
+    async with pool.acquire() as connection:
+        conn = metrics.instrument(connection)
+        users = await get_profiles(conn, matched_users)
         async with conn.transaction():
-            await WaitingCompanionRepo(conn).delete_user_from_queue(user)
-            message = await ping_user(bot, user, users2_dict)
-            await asyncio.sleep(5)
-            await delete_and_change_state_message(bot, message, user, "ApproveStates:approve")
-    except Exception as e:
-        await logger.print_error(f"sent_matching_result: error with user {user}: {str(e)}")
-    finally:
-        await conn.close()
-
-async def sent_matching_result(matching, new_next_matching, users):
-    for user1, user2 in matching:
-        bot = Bot(token=BOT_TOKEN)
-        conn = await get_postgres_connection()
-        await MeetingRepo(conn).add_meeting(user1, user2)
-        await conn.close()
-        await ping_user_and_delete(bot, user1, users[user2])
-        await ping_user_and_delete(bot, user2, users[user1])
-
-def get_stats(free_users, matching, users: dict):
-    workers = set(dict(filter(lambda user: user[1]['user'].role == Role.WORKER, users.items())).keys())
-    students = set(dict(filter(lambda user: user[1]['user'].role == Role.STUDENT, users.items())).keys())
-    all_matching = set(match[0] for match in matching)
-    for match in matching:
-        all_matching.add(match[1])
-    cnt_students = len(students)
-    cnt_workers = len(workers)
-    cnt_students_matching = len(all_matching.difference(workers))
-    cnt_workers_matching = len(all_matching.difference(students))
+            meeting_ids = await MeetingRepo(conn).add_meetings(matching)
+            await WaitingCompanionRepo(conn).delete_users_from_queue(matched_users)
+            await WaitingCompanionRepo(conn).upsert_users_in_queue(free_users, new_next_matching)
+            notifications = get_notifications(free_users, matching, meeting_ids, new_next_matching, users)
+            await NotificationOutboxRepo(conn).add_notifications(notifications)
+    metrics.set('notifications_enqueued', len(notifications))
+    return meeting_ids
+
+def get_stats(free_users, matching, table: CandidateTable):
+    queue = table.role_counts()
+    matched = table.role_counts(user for pair in matching for user in pair)
+    cnt_students = queue[Role.STUDENT]
+    cnt_workers = queue[Role.WORKER]
+    cnt_students_matching = matched[Role.STUDENT]
+    cnt_workers_matching = matched[Role.WORKER]
     cnt_free_students = cnt_students - cnt_students_matching
     cnt_free_workers = cnt_workers - cnt_workers_matching
     return (cnt_students, cnt_workers, cnt_students_matching, cnt_workers_matching,
             cnt_free_students, cnt_free_workers)
 
-async def matching(users, new_next_matching):
-    free_users, matching = OpbTask(users).solve()
-    try:
-        await apologize_for_mismatching(free_users, new_next_matching)
-        await sent_matching_result(matching, new_next_matching, users)
-    except Exception as e:
-        await logger.print_error(f"unexpected error during send massages: {str(e)}")
+async def sync_incremental_matcher(incremental_matcher: IncrementalMatcher, users):
+    if not incremental_matcher.users or incremental_matcher.deltas >= MATCHER_REBUILD_AFTER:
+        # Точный пересчёт идёт в процессах решателя с тем же таймаутом, что и матчинг
+        table = CandidateTable.from_features(list(users.values()))
+        free_users, matching, gap = await solve_by_components(
+            table, SOLVER, MATCHER_WORKERS, MATCHER_TIME_LIMIT, MATCHER_GAP_LIMIT, MATCHER_SOLVER_GRACE,
+            pair_cache=incremental_matcher.pair_cache)
+        await asyncio.get_running_loop().run_in_executor(None, incremental_matcher.rebuild, users, matching, gap)
+    else:
+        joined, left, changed = incremental_matcher.apply(users)
+        await logger.print_info("queue changes: joined = %s, left = %s, changed = %s", joined, left, changed)
+
+
+async def solve(users, table: CandidateTable, incremental_matcher: IncrementalMatcher | None,
+                pair_cache: PairCache | None, metrics: RunMetrics):
+    if incremental_matcher is not None:
+        exact = incremental_matcher.deltas == 0 and incremental_matcher.users == users
+        free_users, matching = incremental_matcher.preview()
+        gap = incremental_matcher.gap
+        incremental_matcher.reset()
+        # Превью точное, только если очередь не менялась после последнего полного пересчёта
+        if exact:
+            return free_users, matching, gap
+    return await solve_by_components(table, SOLVER, MATCHER_WORKERS, MATCHER_TIME_LIMIT, MATCHER_GAP_LIMIT,
+                                     MATCHER_SOLVER_GRACE, metrics, pair_cache)
+
+
+async def matching(pool: Pool, worker: OutboxWorker, metrics: RunMetrics, users, new_next_matching,
+                   incremental_matcher: IncrementalMatcher | None, pair_cache: PairCache | None):
+    with metrics.phase('candidate_table'):
+        table = CandidateTable.from_features(list(users.values()))
+    metrics.set('candidate_table_bytes', table.nbytes)
+    with metrics.phase('solve'):
+        free_users, matching, gap = await solve(users, table, incremental_matcher, pair_cache, metrics)
+    metrics.set('pairs', len(matching))
+    metrics.set('free_users', len(free_users))
+    if gap is not None:
+        metrics.set('gap', gap)
+    await logger.print_info(f"matching solved: pairs = {len(matching)}, free = {len(free_users)}, gap = {gap}")
+    with metrics.phase('db_commit'):
+        await commit_matching(pool, metrics, free_users, matching, new_next_matching)
+    worker.wake()
+
+    await logger.send_matching_info(*get_stats(free_users, matching, table))
+
+
+async def preview_matching(pool: Pool, met_pairs: MetPairsIndex, incremental_matcher: IncrementalMatcher,
+                           next_matching):
+    async with pool.acquire() as connection:
+        users = await get_waiting_companions(connection, met_pairs, next_matching)
+    await sync_incremental_matcher(incremental_matcher, users)
+    free_users, matching = incremental_matcher.preview()
+    await logger.print_info(
+        f"matching preview: pairs = {len(matching)}, free = {len(free_users)}, weight = {incremental_matcher.weight()}")
+
+
+async def get_ready_users(pool: Pool, metrics: RunMetrics, met_pairs: MetPairsIndex, next_matching):
+    new_next_matching: datetime = next_matching + timedelta(days=7)
+    async with pool.acquire() as connection:
+        connection = metrics.instrument(connection)
+        await update_next_matching(new_next_matching, connection)
+        users = await get_waiting_companions(connection, met_pairs, next_matching)
+    metrics.set('queue_size', len(users))
+    return users, new_next_matching
 
-    await logger.send_matching_info(*get_stats(free_users, matching, users))
 
+def create_bot() -> Bot:
+    # Один бот на процесс: одна aiohttp-сессия с keep-alive соединениями и ограниченным пулом
+    return Bot(token=BOT_TOKEN, connections_limit=BOT_CONNECTIONS_LIMIT, timeout=BOT_REQUEST_TIMEOUT)
 
-async def get_ready_users(next_matching):
-    connection: Connection = await get_postgres_connection()
-    new_next_matching: datetime = next_matching + timedelta(days=7)
-    await update_next_matching(new_next_matching, connection)
-    users = await get_waiting_companions(connection, next_matching)
-    await connection.close()
-    return users, new_next_matching
+
+async def close_bot(bot: Bot):
+    session = await bot.get_session()
+    await session.close()
 
 
 async def run():
+    pool: Pool = await create_postgres_pool()
+    redis: Redis = create_redis()
+    bot: Bot = create_bot()
+    dispatcher = NotificationDispatcher(
+        bot=bot,
+        concurrency=NOTIFICATION_CONCURRENCY,
+        global_rate=NOTIFICATION_GLOBAL_RATE,
+        per_chat_rate=NOTIFICATION_PER_CHAT_RATE,
+        max_retries=NOTIFICATION_MAX_RETRIES)
+    exporter = MetricsExporter(METRICS_PROMETHEUS_FILE, METRICS_RUNS_FILE)
+    worker = OutboxWorker(
+        pool=pool,
+        dispatcher=dispatcher,
+        fsm_storage=FsmStorage(redis),
+        batch_size=OUTBOX_BATCH_SIZE,
+        poll_interval=OUTBOX_POLL_INTERVAL,
+        lease_seconds=OUTBOX_LEASE_SECONDS,
+        max_attempts=OUTBOX_MAX_ATTEMPTS,
+        metrics=exporter)
+    met_pairs = MetPairsIndex()
+    async with pool.acquire() as connection:
+        await NotificationOutboxRepo(connection).create_table()
+        # Полный пересчёт признаков: профили могли меняться, пока матчер был выключен
+        await MatchingFeaturesRepo(connection).create_table()
+        await MatchingFeaturesRepo(connection).refresh()
+        await met_pairs.build(connection)
+    # Воркер сразу дорассылает то, что не успели отправить до перезапуска
+    worker_task = asyncio.create_task(worker.run())
+    try:
+        pair_cache = PairCache(MATCHER_PAIR_CACHE_FILE, MATCHER_PAIR_CACHE_MAX_AGE_DAYS * 24 * 60 * 60) \
+            if MATCHER_PAIR_CACHE_FILE else None
+        await serve(pool, worker, exporter, met_pairs,
+                    IncrementalMatcher(pair_cache) if MATCHER_INCREMENTAL else None, pair_cache)
+    finally:
+        worker_task.cancel()
+        await asyncio.gather(worker_task, return_exceptions=True)
+        await close_bot(bot)
+        await alerts.close()
+        await redis.close()
+        await pool.close()
+
+
+async def serve(pool: Pool, worker: OutboxWorker, exporter: MetricsExporter, met_pairs: MetPairsIndex,
+                incremental_matcher: IncrementalMatcher | None, pair_cache: PairCache | None):
     while True:
         try:
-            next_matching: datetime = await get_next_matching_date()
+            next_matching: datetime = await get_next_matching_date(pool)
             now: datetime = datetime.now()
-            await logger.print_info(
-                f"next_matching = {next_matching.second} c, now = {now.second} c, need to wait = {(next_matching - now).total_seconds()} c")
             if next_matching > now:
-                await asyncio.sleep((next_matching - now).total_seconds())
+                await logger.print_info(
+                    f"next_matching = {next_matching.second} c, now = {now.second} c, need to wait = {(next_matching - now).total_seconds()} c")
+                # Просыпаемся раньше матчинга, чтобы держать превью в актуальном состоянии
+                await asyncio.sleep(min((next_matching - now).total_seconds(), MATCHER_SYNC_INTERVAL))
+                if incremental_matcher is not None:
+                    await preview_matching(pool, met_pairs, incremental_matcher, next_matching)
+                continue
             await logger.print_info(f"matching start")
 
-            users, new_next_matching = await get_ready_users(next_matching)
-
-            await matching(users, new_next_matching)
+            metrics = RunMetrics()
+            try:
+                with metrics.phase('health_check'):
+                    await check_postgres_pool(pool)
+                with metrics.phase('queue_load'):
+                    users, new_next_matching = await get_ready_users(pool, metrics, met_pairs, next_matching)
+
+                await matching(pool, worker, metrics, users, new_next_matching, incremental_matcher, pair_cache)
+            finally:
+                # Незавершённый запуск тоже записывается: видно, на какой фазе он упал
+                exporter.record_run(metrics)
         except Exception as e:
             await logger.print_error(f"unexpected error: {str(e)}")
 
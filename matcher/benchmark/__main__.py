@@ -0,0 +1,107 @@
+import argparse
+import json
+import platform
+import resource
+import time
+import tracemalloc
+from datetime import datetime
+
+from matcher.benchmark.synthetic_queue import generate_queue
+from matcher.opb_model.solvers import SOLVERS, get_solver
+
+
+def model_size(task):
+    # У SCIP считаем переменные и ограничения модели, у blossom - рёбра и вершины с рёбрами
+    if hasattr(task, 'model'):
+        return task.model.getNVars(transformed=False), task.model.getNConss(transformed=False)
+    with_edges = set()
+    for (i, j, _) in task.graph.edges:
+        with_edges.add(i)
+        with_edges.add(j)
+    return len(task.graph.edges), len(with_edges)
+
+
+def objective(task, matching) -> int:
+    weights = {}
+    for (i, j, weight) in task.graph.edges:
+        weights[task.t_user_ids[i], task.t_user_ids[j]] = weight
+        weights[task.t_user_ids[j], task.t_user_ids[i]] = weight
+    return sum(weights[pair] for pair in matching)
+
+
+def build_and_solve(solver_name: str, users, time_limit: float, max_edges: int):
+    start = time.perf_counter()
+    task = get_solver(solver_name)(users)
+    build_time = time.perf_counter() - start
+    if len(task.graph.edges) > max_edges:
+        return task, build_time, None, None
+
+    start = time.perf_counter()
+    solution = task.solve(time_limit=time_limit, gap_limit=0.0)
+    return task, build_time, time.perf_counter() - start, solution
+
+
+def peak_memory_mb(solver_name: str, users, time_limit: float, max_edges: int) -> float:
+    # Отдельный прогон: под tracemalloc python-код работает в разы медленнее.
+    # tracemalloc видит только память python, память SCIP попадает лишь в max_rss_mb
+    tracemalloc.start()
+    try:
+        build_and_solve(solver_name, users, time_limit, max_edges)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(solver_name: str, n: int, seed: int, time_limit: float, max_edges: int, trace_memory: bool) -> dict:
+    users = generate_queue(n, seed)
+    task, build_time, solve_time, solution = build_and_solve(solver_name, users, time_limit, max_edges)
+    result = {'solver': solver_name, 'n': n, 'seed': seed, 'build_time': build_time, 'edges': len(task.graph.edges)}
+    if solution is None:
+        result['skipped'] = f"edges > {max_edges}"
+        return result
+
+    free_users, matching = solution
+    # SCIP строит модель внутри solve(): её время отделяется, чтобы solve_time был сравним между солверами
+    result['model_build_time'] = task.stats.get('model_build_seconds', 0.0)
+    result['solve_time'] = solve_time - result['model_build_time']
+    result['variables'], result['constraints'] = model_size(task)
+    result['objective'] = objective(task, matching)
+    result['gap'] = task.gap
+    result['pairs'] = len(matching)
+    result['free'] = len(free_users)
+    if trace_memory:
+        result['peak_memory_mb'] = peak_memory_mb(solver_name, users, time_limit, max_edges)
+    result['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Matching solvers benchmark on synthetic queues")
+    parser.add_argument('--solvers', nargs='+', default=list(SOLVERS.keys()), choices=list(SOLVERS.keys()))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 5000, 10000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-limit', type=float, default=600.0)
+    parser.add_argument('--max-edges', type=int, default=5_000_000,
+                        help="cases with a larger compatibility graph are only built, not solved")
+    parser.add_argument('--no-trace-memory', dest='trace_memory', action='store_false',
+                        help="skip the second run under tracemalloc that measures peak python memory")
+    parser.add_argument('--output', default=f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        for solver_name in args.solvers:
+            result = run_case(solver_name, n, args.seed, args.time_limit, args.max_edges, args.trace_memory)
+            print(json.dumps(result))
+            results.append(result)
+
+    with open(args.output, 'w') as f:
+        json.dump({'created_at': datetime.now().isoformat(),
+                   'python': platform.python_version(),
+                   'machine': platform.machine(),
+                   'time_limit': args.time_limit,
+                   'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
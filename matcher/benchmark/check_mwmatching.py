@@ -0,0 +1,85 @@
+import argparse
+import random
+from typing import List, Tuple
+
+from matcher.opb_model.mwmatching import max_weight_matching
+
+
+def matching_weight(n: int, edges: List[Tuple[int, int, int]], mate: List[int]) -> int:
+    weights = {}
+    for (i, j, weight) in edges:
+        weights[i, j] = weights[j, i] = weight
+    total = 0
+    for v in range(n):
+        if mate[v] >= 0:
+            assert mate[mate[v]] == v, f"mate is not symmetric at vertex {v}"
+            assert (v, mate[v]) in weights, f"matched pair ({v}, {mate[v]}) is not an edge"
+            if v < mate[v]:
+                total += weights[v, mate[v]]
+    return total
+
+
+def brute_force_weight(edges: List[Tuple[int, int, int]]) -> int:
+    best = 0
+
+    def search(k: int, used: frozenset, total: int):
+        nonlocal best
+        best = max(best, total)
+        for m in range(k, len(edges)):
+            i, j, weight = edges[m]
+            if i not in used and j not in used:
+                search(m + 1, used | {i, j}, total + weight)
+
+    search(0, frozenset(), 0)
+    return best
+
+
+def networkx_weight(n: int, edges: List[Tuple[int, int, int]]) -> int | None:
+    # networkx не входит в окружение матчера, сравнение с ним выполняется, только если он установлен
+    try:
+        import networkx
+    except ImportError:
+        return None
+    graph = networkx.Graph()
+    graph.add_nodes_from(range(n))
+    graph.add_weighted_edges_from(edges)
+    return sum(graph[i][j]['weight'] for i, j in networkx.max_weight_matching(graph))
+
+
+def random_graph(rng: random.Random, n: int, density: float, max_weight: int) -> List[Tuple[int, int, int]]:
+    return [(i, j, rng.randint(1, max_weight)) for i in range(n) for j in range(i + 1, n) if rng.random() < density]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks the blossom matching against brute force on small graphs and networkx on larger ones")
+    parser.add_argument('--graphs', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for k in range(args.graphs):
+        n = rng.randint(1, 9)
+        # Маленький диапазон весов даёт много равных весов и вырожденных двойственных переменных
+        edges = random_graph(rng, n, rng.random(), rng.choice((1, 3, 10)))
+        weight = matching_weight(n, edges, max_weight_matching(n, edges))
+        assert weight == brute_force_weight(edges), f"graph {k}: n = {n}, edges = {edges}"
+    print(f"brute force: {args.graphs} graphs ok")
+
+    compared = 0
+    for k in range(args.graphs // 10):
+        n = rng.randint(10, 60)
+        edges = random_graph(rng, n, rng.random(), rng.choice((1, 3, 10)))
+        expected = networkx_weight(n, edges)
+        if expected is None:
+            print("networkx is not installed, comparison skipped")
+            break
+        weight = matching_weight(n, edges, max_weight_matching(n, edges))
+        assert weight == expected, f"graph {k}: n = {n}, edges = {edges}"
+        compared += 1
+    else:
+        print(f"networkx: {compared} graphs ok")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import random
+from dataclasses import dataclass
+from typing import Dict
+
+from matcher.models.Criterion import Criterion, Interest, MeetingFormat, PreferredPlaces
+from matcher.models.Group import Group
+from matcher.models.MyUser import MyUser, Role, Sex
+from matcher.models.WorkPlace import WorkPlace
+
+
+@dataclass(slots=True, frozen=True)
+class QueueProfile:
+    """Distributions of the synthetic queue, defaults are close to a usual weekly queue"""
+    student_share: float = 0.8
+    online_share: float = 0.3
+    offline_share: float = 0.3
+    max_interests: int = 4
+    max_places: int = 2
+    group_size: int = 25
+    work_place_size: int = 10
+    max_homies: int = 3
+
+
+def generate_queue(n: int, seed: int = 0, profile: QueueProfile = QueueProfile()) -> Dict[int, dict]:
+    """Users dict with profiles and homies, the input of CandidateTable.from_users and the solvers"""
+    rnd = random.Random(seed)
+    t_user_ids = rnd.sample(range(10 ** 8, 10 ** 10), n)
+    n_groups = max(1, n // profile.group_size)
+    n_work_places = max(1, n // profile.work_place_size)
+    users = dict()
+    for t_user_id in t_user_ids:
+        role = Role.STUDENT if rnd.random() < profile.student_share else Role.WORKER
+        format_draw = rnd.random()
+        if format_draw < profile.online_share:
+            meeting_format = MeetingFormat.ONLINE
+        elif format_draw < profile.online_share + profile.offline_share:
+            meeting_format = MeetingFormat.OFFLINE
+        else:
+            meeting_format = MeetingFormat.ANY
+        preferred_places = [] if meeting_format == MeetingFormat.ONLINE else \
+            rnd.sample(list(PreferredPlaces), rnd.randint(1, profile.max_places))
+
+        user = MyUser(
+            t_user_id=t_user_id,
+            email=f"{t_user_id}@example.com",
+            full_name=f"user {t_user_id}",
+            sex=rnd.choice(list(Sex)),
+            user_name=f"user_{t_user_id}",
+            user_info="",
+            ban=False,
+            is_student=role == Role.STUDENT,
+            is_worker=role == Role.WORKER,
+            role=role,
+            old_user=False)
+        criterion = Criterion(
+            t_user_id=t_user_id,
+            interests=rnd.sample(list(Interest), rnd.randint(0, profile.max_interests)),
+            meeting_format=meeting_format,
+            preferred_places=preferred_places)
+        if role == Role.STUDENT:
+            group_number = rnd.randrange(n_groups)
+            groups = [Group(f"group{group_number}", rnd.randint(1, 4), f"faculty{group_number % 10}", None)]
+            works = []
+        else:
+            work_place_number = rnd.randrange(n_work_places)
+            groups = []
+            works = [WorkPlace(work_place_number, f"work place {work_place_number}", f"wp{work_place_number}")]
+        users[t_user_id] = {"user": user, "criterion": criterion, "groups": groups, "works": works, "homies": set()}
+
+    for t_user_id in t_user_ids:
+        for homie in rnd.sample(t_user_ids, min(len(t_user_ids), rnd.randint(0, profile.max_homies))):
+            if homie != t_user_id:
+                users[t_user_id]["homies"].add(homie)
+                users[homie]["homies"].add(t_user_id)
+    for user_info in users.values():
+        user_info["homies"] = frozenset(user_info["homies"])
+    return users
@@ -14,15 +14,54 @@ DB_NAME = config['db']['database']
 DB_HOST = config['db']['host']
 DB_USER = config['db']['user']
 DB_PORT = config['db']['port']
+DB_POOL_MIN_SIZE = config.getint('db', 'pool_min_size', fallback=1)
+DB_POOL_MAX_SIZE = config.getint('db', 'pool_max_size', fallback=10)
+DB_STATEMENT_CACHE_SIZE = config.getint('db', 'statement_cache_size', fallback=100)
+DB_MAX_INACTIVE_CONNECTION_LIFETIME = config.getfloat('db', 'max_inactive_connection_lifetime', fallback=300.0)
+DB_HEALTH_CHECK_TIMEOUT = config.getfloat('db', 'health_check_timeout', fallback=10.0)
 
 BOT_TOKEN = config['random_coffee_bot']['token']
+BOT_CONNECTIONS_LIMIT = config.getint('random_coffee_bot', 'connections_limit', fallback=20)
+BOT_REQUEST_TIMEOUT = config.getfloat('random_coffee_bot', 'request_timeout', fallback=30.0)
 
 ALARM_BOT_TOKEN = config['alarm_bot']['token']
 
 CHAT_ID_ALARM = config['alarm_bot']['chat_id']
 CHAT_ID_ALARM_WITH_HR = config['alarm_bot']['chat_id_with_HR']
+# Ошибки копятся alert_window секунд и уходят в чат одним сообщением
+ALERT_WINDOW = config.getfloat('alarm_bot', 'alert_window', fallback=60.0)
+ALERT_MAX_GROUPS = config.getint('alarm_bot', 'alert_max_groups', fallback=20)
 
 REDIS_HOST = config['redis']['redis_host']
 REDIS_PORT = config['redis']['redis_port']
 REDIS_DP = config['redis']['redis_dp']
 REDIS_PASSWORD = config['redis']['redis_password']
+REDIS_MAX_CONNECTIONS = config.getint('redis', 'max_connections', fallback=20)
+
+# Проверки типов typeguard при чтении из БД, дорогие на больших очередях
+DEBUG_TYPE_CHECKS = config.getboolean('debug', 'type_checks', fallback=False)
+
+SOLVER = config.get('matcher', 'solver', fallback='blossom')
+MATCHER_WORKERS = config.getint('matcher', 'workers', fallback=os.cpu_count() or 1)
+MATCHER_TIME_LIMIT = config.getfloat('matcher', 'time_limit', fallback=60.0)
+MATCHER_GAP_LIMIT = config.getfloat('matcher', 'gap_limit', fallback=0.0)
+MATCHER_SOLVER_GRACE = config.getfloat('matcher', 'solver_grace', fallback=30.0)
+MATCHER_INCREMENTAL = config.getboolean('matcher', 'incremental', fallback=False)
+MATCHER_SYNC_INTERVAL = config.getfloat('matcher', 'sync_interval', fallback=600.0)
+MATCHER_REBUILD_AFTER = config.getint('matcher', 'rebuild_after', fallback=50)
+MATCHER_PAIR_CACHE_FILE = config.get('matcher', 'pair_cache_file', fallback='')
+MATCHER_PAIR_CACHE_MAX_AGE_DAYS = config.getfloat('matcher', 'pair_cache_max_age_days', fallback=28.0)
+
+# Ограничения Telegram: ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+NOTIFICATION_CONCURRENCY = config.getint('notifications', 'concurrency', fallback=20)
+NOTIFICATION_GLOBAL_RATE = config.getfloat('notifications', 'global_rate', fallback=25.0)
+NOTIFICATION_PER_CHAT_RATE = config.getfloat('notifications', 'per_chat_rate', fallback=1.0)
+NOTIFICATION_MAX_RETRIES = config.getint('notifications', 'max_retries', fallback=3)
+
+OUTBOX_BATCH_SIZE = config.getint('outbox', 'batch_size', fallback=200)
+OUTBOX_POLL_INTERVAL = config.getfloat('outbox', 'poll_interval', fallback=30.0)
+OUTBOX_LEASE_SECONDS = config.getfloat('outbox', 'lease_seconds', fallback=300.0)
+OUTBOX_MAX_ATTEMPTS = config.getint('outbox', 'max_attempts', fallback=5)
+
+METRICS_PROMETHEUS_FILE = config.get('metrics', 'prometheus_file', fallback='logs/matcher.prom')
+METRICS_RUNS_FILE = config.get('metrics', 'runs_file', fallback='logs/matcher_runs.jsonl')
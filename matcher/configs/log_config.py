@@ -1,9 +1,13 @@
 import logging
 
-from matcher.configs.general_bot_config import VERSION
+from matcher.configs.general_bot_config import VERSION, config
 
 LOG_LEVEL = logging.INFO
 LOG_FILENAME = "logs/" + VERSION + "-log.log"
 LOG_FILEMODE = "a"
 LOG_FORMAT = "%(module)s - %(filename)s - %(funcName)s - %(lineno)d : %(name)s : %(asctime)s : %(levelname)s : %(" \
-             "message)s "
\ No newline at end of file
+             "message)s "
+
+# Структурный режим: JSON в файл, без поиска пользователя в Dispatcher/FSM и без вывода в консоль
+LOG_STRUCTURED = config.getboolean('logging', 'structured', fallback=False)
+LOG_TO_CONSOLE = config.getboolean('logging', 'console', fallback=not LOG_STRUCTURED)
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Tuple
+
+
+@dataclass(slots=True, frozen=True)
+class MatchingFeatures:
+    """Encoded profile of a user in the queue, codes and bits follow the enum order in pair_scoring"""
+    t_user_id: int
+    role: int
+    meeting_format: int
+    interests: int
+    places: int
+    group_names: Tuple[str, ...]
+    work_names: Tuple[str, ...]
+    homies: FrozenSet[int] = frozenset()
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+from enum import Enum
+
+
+class NotificationKind(str, Enum):
+    MATCHED = "matched"
+    MISMATCHED = "mismatched"
+
+
+@dataclass(slots=True, frozen=True)
+class Notification:
+    t_user_id: int
+    kind: NotificationKind
+    text: str
+    new_state: str
+    meeting_id: int | None = None
+    id: int | None = None
+    attempts: int = 0
@@ -0,0 +1,27 @@
+import time
+
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.CompatibilityGraph import CompatibilityGraph
+from matcher.opb_model.mwmatching import max_weight_matching
+from matcher.opb_model.selected_edges import matching_from_pairs, pairs_from_mate
+
+
+class BlossomTask:
+    """Maximum-weight matching over the compatibility graph solved with Edmonds' blossom algorithm"""
+
+    def __init__(self, users, graph=None):
+        self.users = users
+        # Готовый граф (например, компонента связности) можно передать вместо users
+        self.graph = graph if graph is not None else CompatibilityGraph(CandidateTable.from_users(users))
+        self.t_user_ids = self.graph.t_user_ids
+        self.gap = None
+        self.stats = dict()
+
+    def solve(self, time_limit=None, gap_limit=None):
+        # Точный алгоритм за полиномиальное время: ограничения не нужны, зазор всегда нулевой
+        self.gap = 0.0
+        start = time.perf_counter()
+        mate = max_weight_matching(len(self.t_user_ids), self.graph.edges)
+        self.stats['solve_seconds'] = time.perf_counter() - start
+        self.stats['edges'] = len(self.graph.edges)
+        return matching_from_pairs(self.t_user_ids, pairs_from_mate(mate))
@@ -0,0 +1,112 @@
+import itertools
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from matcher.models.MatchingFeatures import MatchingFeatures
+from matcher.models.MyUser import Role
+from matcher.opb_model.pair_scoring import encode_features, to_features, ROLE_CODES
+
+
+def _csr(rows: Iterable[List[int]], n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets and ids: ids of row k are ids[offsets[k]:offsets[k + 1]]"""
+    offsets = np.zeros(n + 1, dtype=np.int32)
+    ids = []
+    for k, row in enumerate(rows):
+        ids.extend(row)
+        offsets[k + 1] = len(ids)
+    return offsets, np.array(ids, dtype=np.int32)
+
+
+def _intern(names, codes: Dict[str, int]) -> List[int]:
+    return [codes.setdefault(name, len(codes)) for name in names]
+
+
+class CandidateTable:
+    """
+    The queue as a struct of arrays, users are dense indices 0..n-1.
+    Roles and meeting formats are int8 codes, interests and places are bitmasks,
+    groups, workplaces and homies are CSR arrays: groups and workplaces by interned name, homies by dense index.
+    About 40 bytes per user instead of the dicts of MyUser, Criterion, Group and WorkPlace objects.
+    """
+
+    __slots__ = ('t_user_ids', 'roles', 'formats', 'interests', 'places',
+                 'group_offsets', 'group_ids', 'work_offsets', 'work_ids', 'homie_offsets', 'homie_ids')
+
+    def __init__(self, t_user_ids: np.ndarray, roles: np.ndarray, formats: np.ndarray, interests: np.ndarray,
+                 places: np.ndarray, group_offsets: np.ndarray, group_ids: np.ndarray, work_offsets: np.ndarray,
+                 work_ids: np.ndarray, homie_offsets: np.ndarray, homie_ids: np.ndarray):
+        self.t_user_ids = t_user_ids
+        self.roles = roles
+        self.formats = formats
+        self.interests = interests
+        self.places = places
+        self.group_offsets = group_offsets
+        self.group_ids = group_ids
+        self.work_offsets = work_offsets
+        self.work_ids = work_ids
+        self.homie_offsets = homie_offsets
+        self.homie_ids = homie_ids
+
+    @staticmethod
+    def from_features(features: List[MatchingFeatures]) -> 'CandidateTable':
+        """Table of the queue, rows keep the order of features"""
+        n = len(features)
+        index = {feature.t_user_id: i for i, feature in enumerate(features)}
+        group_codes, work_codes = dict(), dict()
+        group_offsets, group_ids = _csr((_intern(feature.group_names, group_codes) for feature in features), n)
+        work_offsets, work_ids = _csr((_intern(feature.work_names, work_codes) for feature in features), n)
+        # Встречавшиеся вне очереди не влияют на пары, храним только тех, кто в очереди
+        homie_offsets, homie_ids = _csr(
+            ([index[homie] for homie in feature.homies if homie in index and homie != feature.t_user_id]
+             for feature in features), n)
+        t_user_ids = np.fromiter((feature.t_user_id for feature in features), dtype=np.int64, count=n)
+        return CandidateTable(t_user_ids, *encode_features(features),
+                              group_offsets, group_ids, work_offsets, work_ids, homie_offsets, homie_ids)
+
+    @staticmethod
+    def from_users(users: Dict[int, dict]) -> 'CandidateTable':
+        """Table of users dict in the format of to_features, rows keep the order of the dict"""
+        return CandidateTable.from_features(
+            [to_features(t_user_id, user_info) for t_user_id, user_info in users.items()])
+
+    def __len__(self) -> int:
+        return len(self.t_user_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    @staticmethod
+    def _owners(offsets: np.ndarray) -> np.ndarray:
+        return np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+
+    def _members_keys(self, offsets: np.ndarray, ids: np.ndarray) -> List[int]:
+        owners = self._owners(offsets)
+        order = np.argsort(ids, kind='stable')
+        bounds = np.flatnonzero(np.diff(ids[order])) + 1
+        n = len(self)
+        keys = []
+        for members in np.split(owners[order], bounds) if len(order) else []:
+            # Владельцы в группе уже упорядочены по возрастанию благодаря стабильной сортировке
+            keys.extend(a * n + b for a, b in itertools.combinations(members.tolist(), 2))
+        return keys
+
+    def forbidden_keys(self) -> np.ndarray:
+        """Sorted unique i * n + j, i < j, of homies and pairs from the same group or workplace"""
+        n = len(self)
+        owners = self._owners(self.homie_offsets)
+        homies = self.homie_ids.astype(np.int64)
+        keys = [np.minimum(owners, homies) * n + np.maximum(owners, homies),
+                np.array(self._members_keys(self.group_offsets, self.group_ids), dtype=np.int64),
+                np.array(self._members_keys(self.work_offsets, self.work_ids), dtype=np.int64)]
+        return np.unique(np.concatenate(keys))
+
+    def role_counts(self, t_user_ids: Iterable[int] | None = None) -> Dict[Role, int]:
+        """Number of users of every role, of the whole table or only of the given users"""
+        roles = self.roles
+        if t_user_ids is not None:
+            selected = np.fromiter(t_user_ids, dtype=np.int64)
+            roles = roles[np.isin(self.t_user_ids, selected)]
+        counts = np.bincount(roles, minlength=len(ROLE_CODES))
+        return {role: int(counts[code]) for role, code in ROLE_CODES.items()}
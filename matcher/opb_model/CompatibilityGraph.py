@@ -0,0 +1,98 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.pair_scoring import admissible_pairs, pair_weights
+
+
+class GraphComponent:
+    """Connected component of the compatibility graph with vertices renumbered from zero, picklable"""
+
+    __slots__ = ('t_user_ids', 'edges')
+
+    def __init__(self, t_user_ids: List[int], edges: List[Tuple[int, int, int]]):
+        self.t_user_ids = t_user_ids
+        self.edges = edges
+
+
+class CompatibilityGraph:
+    """
+    Admissible pairs of the queue. Feasibility and weights of all pairs come out of vectorised operations
+    over the columns of CandidateTable, and pairs that can never meet (different roles, online with offline,
+    offline without a common place) are never materialised.
+    Homies and pairs from the same group or workplace are dropped up front.
+    Vertices are rows of the table, edges are (i, j, weight) with i < j.
+    """
+
+    def __init__(self, table: CandidateTable, pair_cache=None):
+        self.table = table
+        # PairCache: пары неизменившихся с прошлого запуска пользователей не пересчитываются
+        self.pair_cache = pair_cache
+        self.t_user_ids: List[int] = table.t_user_ids.tolist()
+        self.roles, self.formats, self.interests, self.places = \
+            table.roles, table.formats, table.interests, table.places
+        self.edge_i = np.empty(0, dtype=np.int64)
+        self.edge_j = np.empty(0, dtype=np.int64)
+        self.edge_weight = np.empty(0, dtype=np.int64)
+        self.edges: List[Tuple[int, int, int]] = []
+        self._build()
+
+    def _build(self):
+        if self.pair_cache is not None:
+            i, j, weight = self.pair_cache.pairs(self.table)
+        else:
+            i, j = admissible_pairs(self.roles, self.formats, self.places)
+            weight = None
+
+        forbidden_keys = self.table.forbidden_keys()
+        if len(forbidden_keys):
+            allowed = ~np.isin(i * len(self.t_user_ids) + j, forbidden_keys)
+            i, j = i[allowed], j[allowed]
+            weight = weight[allowed] if weight is not None else None
+
+        self.edge_i, self.edge_j = i, j
+        self.edge_weight = weight if weight is not None else pair_weights(self.interests, self.edge_i, self.edge_j)
+        self.edges = list(zip(self.edge_i.tolist(), self.edge_j.tolist(), self.edge_weight.tolist()))
+
+    def component_labels(self) -> np.ndarray:
+        """Component number of every vertex, union-find over the edges"""
+        parent = list(range(len(self.t_user_ids)))
+
+        def find(v):
+            while parent[v] != v:
+                parent[v] = parent[parent[v]]
+                v = parent[v]
+            return v
+
+        for (i, j, _) in self.edges:
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[max(root_i, root_j)] = min(root_i, root_j)
+        return np.fromiter((find(v) for v in range(len(parent))), dtype=np.int64, count=len(parent))
+
+    def components(self) -> Tuple[List[GraphComponent], List[int]]:
+        """Components with at least one edge and users without any admissible companion"""
+        labels = self.component_labels()
+        t_user_ids = np.array(self.t_user_ids, dtype=np.int64)
+        local = np.empty(len(labels), dtype=np.int64)
+        edge_labels = labels[self.edge_i]
+        # Стабильная сортировка сохраняет порядок рёбер внутри компоненты
+        order = np.argsort(edge_labels, kind='stable')
+        bounds = np.flatnonzero(np.diff(edge_labels[order])) + 1
+        vertex_order = np.argsort(labels, kind='stable')
+        vertex_labels, starts = np.unique(labels[vertex_order], return_index=True)
+        vertexes_by_label = dict(zip(vertex_labels.tolist(), np.split(vertex_order, starts[1:])))
+        components = []
+        for edges in np.split(order, bounds) if len(order) else []:
+            vertexes = vertexes_by_label[int(edge_labels[edges[0]])]
+            local[vertexes] = np.arange(len(vertexes))
+            components.append(GraphComponent(
+                t_user_ids[vertexes].tolist(),
+                list(zip(local[self.edge_i[edges]].tolist(),
+                         local[self.edge_j[edges]].tolist(),
+                         self.edge_weight[edges].tolist()))))
+        has_edges = np.zeros(len(labels), dtype=bool)
+        has_edges[self.edge_i] = True
+        has_edges[self.edge_j] = True
+        return components, t_user_ids[~has_edges].tolist()
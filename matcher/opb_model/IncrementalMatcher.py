@@ -0,0 +1,180 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from matcher.models.MatchingFeatures import MatchingFeatures
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.CompatibilityGraph import CompatibilityGraph
+from matcher.opb_model.pair_cache import PairCache
+from matcher.opb_model.pair_scoring import encode_features, admissible_mask, POPCOUNT, INTEREST_DTYPE, PLACE_DTYPE
+
+# Сколько раз подряд вершина может вытеснить чужого напарника при локальном ремонте
+REPAIR_DEPTH = 8
+
+
+class IncrementalMatcher:
+    """
+    Keeps the compatibility graph of the queue and the current matching in memory.
+    Joins, leaves and profile changes are applied as deltas: only edges of the changed user are recomputed,
+    and the matching is repaired locally with short weight-increasing alternating paths from the changed vertices.
+    The repair is a heuristic, not an augmentation to the optimum: the matching is exact only right after rebuild()
+    (up to the gap of the solver).
+    preview() returns the current matching at any time.
+    """
+
+    def __init__(self, pair_cache: PairCache | None = None):
+        self.pair_cache = pair_cache
+        self.reset()
+
+    def reset(self):
+        self.users: Dict[int, MatchingFeatures] = {}
+        self.neighbours: Dict[int, Dict[int, int]] = {}
+        self.mate: Dict[int, int] = {}
+        self.t_user_ids: List[int] = []
+        self.index: Dict[int, int] = {}
+        self.roles = np.empty(0, dtype=np.int8)
+        self.formats = np.empty(0, dtype=np.int8)
+        self.interests = np.empty(0, dtype=INTEREST_DTYPE)
+        self.places = np.empty(0, dtype=PLACE_DTYPE)
+        self.deltas = 0
+        self.gap: float | None = None
+
+    def _is_forbidden(self, t_user_id1: int, t_user_id2: int) -> bool:
+        features1 = self.users[t_user_id1]
+        features2 = self.users[t_user_id2]
+        return t_user_id2 in features1.homies or t_user_id1 in features2.homies or \
+            not set(features1.group_names).isdisjoint(features2.group_names) or \
+            not set(features1.work_names).isdisjoint(features2.work_names)
+
+    def _add_vertex(self, t_user_id: int, features: MatchingFeatures):
+        roles, formats, interests, places = encode_features([features])
+        mask = admissible_mask(roles, formats, places, self.roles, self.formats, self.places)[0]
+        candidates = np.flatnonzero(mask)
+        weights = POPCOUNT[self.interests[candidates] & interests[0]] + 1
+
+        self.users[t_user_id] = features
+        self.neighbours[t_user_id] = {}
+        for k, weight in zip(candidates.tolist(), weights.tolist()):
+            companion = self.t_user_ids[k]
+            if not self._is_forbidden(t_user_id, companion):
+                self.neighbours[t_user_id][companion] = weight
+                self.neighbours[companion][t_user_id] = weight
+
+        self.index[t_user_id] = len(self.t_user_ids)
+        self.t_user_ids.append(t_user_id)
+        self.roles = np.append(self.roles, roles)
+        self.formats = np.append(self.formats, formats)
+        self.interests = np.append(self.interests, interests)
+        self.places = np.append(self.places, places)
+
+    def _remove_vertex(self, t_user_id: int):
+        for companion in self.neighbours.pop(t_user_id):
+            del self.neighbours[companion][t_user_id]
+        del self.users[t_user_id]
+
+        # Удалённую вершину замещает последняя, чтобы массивы оставались плотными
+        k = self.index.pop(t_user_id)
+        last = len(self.t_user_ids) - 1
+        if k != last:
+            moved = self.t_user_ids[last]
+            self.t_user_ids[k] = moved
+            self.index[moved] = k
+            for array in (self.roles, self.formats, self.interests, self.places):
+                array[k] = array[last]
+        self.t_user_ids.pop()
+        self.roles, self.formats = self.roles[:last], self.formats[:last]
+        self.interests, self.places = self.interests[:last], self.places[:last]
+
+    def _unmatch(self, t_user_id: int) -> int | None:
+        companion = self.mate.pop(t_user_id, None)
+        if companion is not None:
+            del self.mate[companion]
+        return companion
+
+    def _best_free_neighbour(self, t_user_id: int, excluded: int) -> Tuple[int | None, int]:
+        best, best_weight = None, 0
+        for companion, weight in self.neighbours[t_user_id].items():
+            if companion not in self.mate and companion != excluded and weight > best_weight:
+                best, best_weight = companion, weight
+        return best, best_weight
+
+    def _repair(self, t_user_id: int, depth: int = REPAIR_DEPTH):
+        """
+        Augments from a free vertex v along the best of alternating paths:
+        v - free u; v - u = w with w left free and repaired next; v - u = w - free x, which ends the path.
+        """
+        while t_user_id is not None and depth > 0 and t_user_id not in self.mate:
+            best, best_gain, best_end = None, 0, None
+            for companion, weight in self.neighbours[t_user_id].items():
+                if companion not in self.mate:
+                    gain, end = weight, None
+                else:
+                    displaced = self.mate[companion]
+                    gain = weight - self.neighbours[companion][displaced]
+                    end, end_weight = self._best_free_neighbour(displaced, t_user_id)
+                    gain += end_weight
+                if gain > best_gain:
+                    best, best_gain, best_end = companion, gain, end
+            if best is None:
+                return
+            displaced = self._unmatch(best)
+            self.mate[t_user_id], self.mate[best] = best, t_user_id
+            if best_end is not None:
+                self.mate[displaced], self.mate[best_end] = best_end, displaced
+                return
+            t_user_id, depth = displaced, depth - 1
+
+    def join(self, t_user_id: int, features: MatchingFeatures):
+        self._add_vertex(t_user_id, features)
+        self.deltas += 1
+        self._repair(t_user_id)
+
+    def leave(self, t_user_id: int):
+        companion = self._unmatch(t_user_id)
+        self._remove_vertex(t_user_id)
+        self.deltas += 1
+        if companion is not None:
+            self._repair(companion)
+
+    def update(self, t_user_id: int, features: MatchingFeatures):
+        self.leave(t_user_id)
+        self.join(t_user_id, features)
+
+    def apply(self, users: Dict[int, MatchingFeatures]) -> Tuple[int, int, int]:
+        """Brings the queue to the state of the features dict, returns numbers of joined, left and changed users"""
+        left = [t_user_id for t_user_id in self.users if t_user_id not in users]
+        joined = [t_user_id for t_user_id in users if t_user_id not in self.users]
+        changed = [t_user_id for t_user_id in users
+                   if t_user_id in self.users and self.users[t_user_id] != users[t_user_id]]
+        for t_user_id in left:
+            self.leave(t_user_id)
+        for t_user_id in changed:
+            self.update(t_user_id, users[t_user_id])
+        for t_user_id in joined:
+            self.join(t_user_id, users[t_user_id])
+        return len(joined), len(left), len(changed)
+
+    def rebuild(self, users: Dict[int, MatchingFeatures], matching: List[Tuple[int, int]], gap: float):
+        """Replaces the state with the queue and its matching solved by solve_by_components, resets deltas"""
+        graph = CompatibilityGraph(CandidateTable.from_features(list(users.values())), self.pair_cache)
+        self.reset()
+        self.users = dict(users)
+        self.t_user_ids = list(graph.t_user_ids)
+        self.index = {t_user_id: k for k, t_user_id in enumerate(self.t_user_ids)}
+        self.roles, self.formats, self.interests, self.places = graph.roles, graph.formats, graph.interests, graph.places
+        self.neighbours = {t_user_id: {} for t_user_id in self.t_user_ids}
+        for (i, j, weight) in graph.edges:
+            self.neighbours[self.t_user_ids[i]][self.t_user_ids[j]] = weight
+            self.neighbours[self.t_user_ids[j]][self.t_user_ids[i]] = weight
+        self.gap = gap
+        for t_user_id1, t_user_id2 in matching:
+            self.mate[t_user_id1], self.mate[t_user_id2] = t_user_id2, t_user_id1
+
+    def weight(self) -> int:
+        return sum(self.neighbours[t_user_id][companion]
+                   for t_user_id, companion in self.mate.items() if t_user_id < companion)
+
+    def preview(self) -> Tuple[List[int], List[Tuple[int, int]]]:
+        matching = [(t_user_id, companion) for t_user_id, companion in self.mate.items() if t_user_id < companion]
+        free_users = [t_user_id for t_user_id in self.t_user_ids if t_user_id not in self.mate]
+        return free_users, matching
@@ -1,154 +1,85 @@
-from typing import List
+import time
 
+from pyscipopt import quicksum
 from pyscipopt.scip import Model
-from typeguard import check_type
 
-from matcher.models.Criterion import Criterion, MeetingFormat
-from matcher.models.Group import Group
-from matcher.models.MyUser import MyUser
-from matcher.models.WorkPlace import WorkPlace
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.CompatibilityGraph import CompatibilityGraph
+from matcher.opb_model.greedy import greedy_matching, GREEDY_GAP
+from matcher.opb_model.selected_edges import matching_from_pairs
 
 
 class OpbTask:
-    def __init__(self, users):
+    def __init__(self, users, graph=None):
         self.users = users
+        # Готовый граф (например, компонента связности) можно передать вместо users
+        self.graph = graph if graph is not None else CompatibilityGraph(CandidateTable.from_users(users))
+        self.t_user_ids = self.graph.t_user_ids
         self.model = Model()
-        self.vars = dict()
+        # vars[k] - переменная ребра graph.edges[k], пользователи - плотные индексы 0..n-1
+        self.vars = []
+        self.gap = None
+        self.stats = dict()
 
-    def _get_var(self, t_user_id1: int, t_user_id2: int):
-
-        check_type(t_user_id1, int)
-        check_type(t_user_id2, int)
-
-        key = f"{t_user_id1}_{t_user_id2}"
-        if t_user_id1 > t_user_id2:
-            key = f"{t_user_id2}_{t_user_id1}"
-        if key not in self.vars:
-            self.vars[key] = self.model.addVar(vtype="B", name=key, lb=0, ub=1)
-        return self.vars[key]
-
-    def _get_objective_function(self):
-        objective = 0
-        t_user_ids = list(self.users.keys())
-        for i in range(len(t_user_ids)):
-            for j in range(i + 1, len(t_user_ids)):
-                var = self._get_var(t_user_ids[i], t_user_ids[j])
-                criterion_user_1: Criterion = self.users[t_user_ids[i]]["criterion"]
-                criterion_user_2: Criterion = self.users[t_user_ids[j]]["criterion"]
-                coeff = len(set(criterion_user_1.interests) & set(criterion_user_2.interests)) + 1
-                objective -= coeff * var
-        return objective
+    def _add_vars(self):
+        # Вес ребра сразу задаётся коэффициентом в целевой функции, без построения выражения
+        self.vars = [self.model.addVar(vtype="B", lb=0, ub=1, obj=-weight) for (_, _, weight) in self.graph.edges]
 
     def _only_one_companion_constraints(self):
-        t_user_ids = list(self.users.keys())
-        constraints = []
-        for i in range(len(t_user_ids)):
-            constraint = 0
-            for j in range(len(t_user_ids)):
-                if i == j:
-                    continue
-                constraint += self._get_var(t_user_ids[i], t_user_ids[j]) * 1
-            constraints.append(constraint <= 1)
-        return constraints
-
-    def _forbid_homies_constraints(self):
-        constraints = []
-        for t_user_id, user_dict in self.users.items():
-            for homies_t_user_id in user_dict['homies']:
-                var = self._get_var(t_user_id, homies_t_user_id)
-                constraints.append(var <= 0)
-        return constraints
-
-    def _forbid_not_intersection_place_constraints(self):
-        constraints = []
-        t_user_ids = list(self.users.keys())
-        for i in range(len(t_user_ids)):
-            for j in range(i + 1, len(t_user_ids)):
-                var = self._get_var(t_user_ids[i], t_user_ids[j])
-                criterion_user_1: Criterion = self.users[t_user_ids[i]]["criterion"]
-                criterion_user_2: Criterion = self.users[t_user_ids[j]]["criterion"]
-                if criterion_user_1.meeting_format == MeetingFormat.OFFLINE and \
-                    criterion_user_2.meeting_format == MeetingFormat.ONLINE:
-                    constraints.append(var <= 0)
-
-                if criterion_user_1.meeting_format == MeetingFormat.ONLINE and \
-                    criterion_user_2.meeting_format == MeetingFormat.OFFLINE:
-                    constraints.append(var <= 0)
-
-                if criterion_user_1.meeting_format != MeetingFormat.ONLINE and \
-                    criterion_user_2.meeting_format != MeetingFormat.ONLINE and \
-                        not (criterion_user_1.meeting_format == MeetingFormat.ANY and
-                             criterion_user_2.meeting_format == MeetingFormat.ANY):
-                    if len(set(criterion_user_1.preferred_places).
-                                   intersection(set(criterion_user_2.preferred_places))) == 0:
-                        constraints.append(var <= 0)
-
-        return constraints
-
-    def _forbid_not_different_role_constraints(self):
-        constraints = []
-        t_user_ids = list(self.users.keys())
-        for i in range(len(t_user_ids)):
-            for j in range(i + 1, len(t_user_ids)):
-                var = self._get_var(t_user_ids[i], t_user_ids[j])
-                user1: MyUser = self.users[t_user_ids[i]]["user"]
-                user2: MyUser = self.users[t_user_ids[j]]["user"]
-                if user1.role != user2.role:
-                    constraints.append(var <= 0)
-        return constraints
-
-    def _is_cross_groups(self, groups_user1: List[Group], groups_user2: List[Group]):
-        set_groups_user1 = set(map(lambda group_user1: group_user1.name, groups_user1))
-        set_groups_user2 = set(map(lambda group_user2: group_user2.name, groups_user2))
-        return len(set_groups_user1 & set_groups_user2) != 0
-
-    def _is_cross_works(self, works_user1: List[WorkPlace], works_user2: List[WorkPlace]):
-        set_works_user1 = set(map(lambda work_user1: work_user1.name, works_user1))
-        set_works_user2 = set(map(lambda work_user2: work_user2.name, works_user2))
-        return len(set_works_user1 & set_works_user2) != 0
-
-    def _forbid_same_group_or_departament_constraints(self):
+        incident = [[] for _ in self.t_user_ids]
+        for var, (i, j, _) in zip(self.vars, self.graph.edges):
+            incident[i].append(var)
+            incident[j].append(var)
         constraints = []
-        t_user_ids = list(self.users.keys())
-        for i in range(len(t_user_ids)):
-            for j in range(i + 1, len(t_user_ids)):
-                var = self._get_var(t_user_ids[i], t_user_ids[j])
-                groups_user1: List[Group] = self.users[t_user_ids[i]]["groups"]
-                groups_user2: List[Group] = self.users[t_user_ids[j]]["groups"]
-                works_user1: List[WorkPlace] = self.users[t_user_ids[i]]["works"]
-                works_user2: List[WorkPlace] = self.users[t_user_ids[j]]["works"]
-                if self._is_cross_groups(groups_user1, groups_user2) or self._is_cross_works(works_user1, works_user2):
-                    constraints.append(var <= 0)
-
+        for user_vars in incident:
+            if user_vars:
+                constraints.append(quicksum(user_vars) <= 1)
         return constraints
 
     def _generate_task(self):
-        self.model.setObjective(self._get_objective_function())
-        [self.model.addCons(constraint) for constraint in self._only_one_companion_constraints()]
-        [self.model.addCons(constraint) for constraint in self._forbid_homies_constraints()]
-        [self.model.addCons(constraint) for constraint in self._forbid_not_intersection_place_constraints()]
-        [self.model.addCons(constraint) for constraint in self._forbid_not_different_role_constraints()]
-        [self.model.addCons(constraint) for constraint in self._forbid_same_group_or_departament_constraints()]
-
-    def _get_matching(self, solution):
-        matching = []
-        t_user_ids = list(self.users.keys())
-        used = set()
-        for i in range(len(t_user_ids)):
-            for j in range(i + 1, len(t_user_ids)):
-                var = self._get_var(t_user_ids[i], t_user_ids[j])
-                if solution[var]:
-                    matching.append((t_user_ids[i], t_user_ids[j]))
-                    assert t_user_ids[i] not in used, "t_user_ids[i] already in used"
-                    assert t_user_ids[j] not in used, "t_user_ids[j] already in used"
-                    used.add(t_user_ids[i])
-                    used.add(t_user_ids[j])
-        free_users = list(set(t_user_ids).difference(used))
-        return free_users, matching
-
-
-    def solve(self, time_limit=10000):
-        self.model.setParam('limits/time', time_limit)
+        self._add_vars()
+        constraints = self._only_one_companion_constraints()
+        [self.model.addCons(constraint) for constraint in constraints]
+        self.stats['variables'] = len(self.vars)
+        self.stats['only_one_companion_constraints'] = len(constraints)
+
+    def _selected_pairs(self, solution):
+        """Edges with value 1: once a vertex is matched, its other edges are not read from the solver"""
+        matched = [False] * len(self.t_user_ids)
+        pairs = []
+        for var, (i, j, _) in zip(self.vars, self.graph.edges):
+            if not matched[i] and not matched[j] and solution[var] > 0.5:
+                matched[i] = matched[j] = True
+                pairs.append((i, j))
+        return pairs
+
+    def _add_warm_start(self):
+        # Жадное паросочетание - допустимое начальное решение, SCIP сразу начинает с хорошей нижней оценки
+        mate = greedy_matching(len(self.t_user_ids), self.graph.edges)
+        solution = self.model.createSol()
+        for var, (i, j, _) in zip(self.vars, self.graph.edges):
+            if mate[i] == j:
+                self.model.setSolVal(solution, var, 1)
+        self.model.addSol(solution)
+
+    def solve(self, time_limit=60, gap_limit=0.0):
+        """
+        Best solution found within time_limit seconds (model building included) or relative gap_limit,
+        its proven gap is saved to self.gap
+        """
+        self.model.setParam('limits/gap', gap_limit)
+        start = time.perf_counter()
         self._generate_task()
+        self._add_warm_start()
+        self.stats['model_build_seconds'] = time.perf_counter() - start
+        # Лимит SCIP отсчитывается от optimize(), поэтому ему остаётся то, что не ушло на построение модели
+        self.model.setParam('limits/time', max(time_limit - self.stats['model_build_seconds'], 0.0))
+        start = time.perf_counter()
         self.model.optimize()
-        return self._get_matching(self.model.getBestSol())
\ No newline at end of file
+        self.stats['solve_seconds'] = time.perf_counter() - start
+        # Жадный тёплый старт уже доказывает зазор не больше GREEDY_GAP, даже если SCIP не поднял двойственную оценку
+        self.gap = min(self.model.getGap(), GREEDY_GAP)
+        start = time.perf_counter()
+        result = matching_from_pairs(self.t_user_ids, self._selected_pairs(self.model.getBestSol()))
+        self.stats['extract_seconds'] = time.perf_counter() - start
+        return result
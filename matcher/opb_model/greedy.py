@@ -0,0 +1,46 @@
+from typing import List, Sequence, Tuple
+
+# Жадное паросочетание не хуже половины оптимума, значит относительный зазор не больше 1
+GREEDY_GAP = 1.0
+
+
+def greedy_matching(n_vertex: int, edges: Sequence[Tuple[int, int, int]]) -> List[int]:
+    """
+    Fast 1/2-approximate matching: heaviest edges first, then local search
+    that replaces a matched edge (a, b) with two edges (x, a), (b, y) to free vertices when it is heavier.
+    Returns mate list in the same format as max_weight_matching.
+    """
+    mate = n_vertex * [-1]
+    for k in sorted(range(len(edges)), key=lambda k: edges[k][2], reverse=True):
+        i, j, _ = edges[k]
+        if mate[i] == -1 and mate[j] == -1:
+            mate[i], mate[j] = j, i
+
+    weight = {}
+    neighbours = [[] for _ in range(n_vertex)]
+    for (i, j, w) in edges:
+        weight[i, j] = weight[j, i] = w
+        neighbours[i].append(j)
+        neighbours[j].append(i)
+
+    def best_free_neighbour(v, excluded):
+        best, best_weight = -1, 0
+        for u in neighbours[v]:
+            if mate[u] == -1 and u != excluded and weight[v, u] > best_weight:
+                best, best_weight = u, weight[v, u]
+        return best, best_weight
+
+    improved = True
+    while improved:
+        improved = False
+        for a in range(n_vertex):
+            b = mate[a]
+            if b < a:
+                continue
+            x, weight_x = best_free_neighbour(a, -1)
+            y, weight_y = best_free_neighbour(b, x)
+            if x != -1 and y != -1 and weight_x + weight_y > weight[a, b]:
+                mate[a], mate[x] = x, a
+                mate[b], mate[y] = y, b
+                improved = True
+    return mate
@@ -0,0 +1,128 @@
+import os
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.pair_scoring import admissible_mask, pair_weights, ROWS_CHUNK, INTEREST_DTYPE, PLACE_DTYPE
+
+# Меняется вместе с правилами допустимости пар или весами, старый кэш тогда не читается
+SCORING_VERSION = 1
+
+ROLE_SHIFT, FORMAT_SHIFT, INTEREST_SHIFT = 40, 32, 16
+
+
+# Ключ упаковывает роль, формат, до 16 интересов и до 16 мест
+def profile_keys(roles: np.ndarray, formats: np.ndarray, interests: np.ndarray, places: np.ndarray) -> np.ndarray:
+    """Content key of the profile fields pairs depend on, packed without collisions"""
+    return (roles.astype(np.uint64) << np.uint64(ROLE_SHIFT)) | \
+        (formats.astype(np.uint64) << np.uint64(FORMAT_SHIFT)) | \
+        (interests.astype(np.uint64) << np.uint64(INTEREST_SHIFT)) | places.astype(np.uint64)
+
+
+def unpack_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    return ((keys >> np.uint64(ROLE_SHIFT)).astype(np.int8),
+            ((keys >> np.uint64(FORMAT_SHIFT)) & np.uint64(0xFF)).astype(np.int8),
+            ((keys >> np.uint64(INTEREST_SHIFT)) & np.uint64(0xFFFF)).astype(INTEREST_DTYPE),
+            (keys & np.uint64(0xFFFF)).astype(PLACE_DTYPE))
+
+
+class PairCache:
+    """
+    Admissible pairs and their weights from previous runs, persisted in an npz file.
+    Vertices are users with the content key of their profile and the time they were last seen in the queue.
+    The cache is complete: every two cached vertices were compared, so a missing edge means a forbidden pair.
+    A run reuses edges between users whose key did not change and compares only changed and new users
+    with everybody, O(changed * n) instead of O(n^2). Users that left the queue are kept for max_age seconds.
+    Homies, groups and workplaces are not cached, CompatibilityGraph filters them on every run.
+    """
+
+    def __init__(self, path: str, max_age: float):
+        self.path = path
+        self.max_age = max_age
+        self.t_user_ids = np.empty(0, dtype=np.int64)
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.last_seen = np.empty(0, dtype=np.float64)
+        self.edge_i = np.empty(0, dtype=np.int64)
+        self.edge_j = np.empty(0, dtype=np.int64)
+        self.edge_weight = np.empty(0, dtype=np.int64)
+        self.stats: Dict[str, float] = dict()
+        self.loaded = False
+
+    def load(self):
+        self.loaded = True
+        if not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            if int(data['version']) != SCORING_VERSION:
+                return
+            self.t_user_ids, self.keys, self.last_seen = data['t_user_ids'], data['keys'], data['last_seen']
+            self.edge_i, self.edge_j, self.edge_weight = data['edge_i'], data['edge_j'], data['edge_weight']
+
+    def save(self):
+        tmp_file = self.path + '.tmp.npz'
+        # Индексы и веса на диске в узких типах: рёбер в кэше миллионы
+        np.savez(tmp_file, version=SCORING_VERSION, t_user_ids=self.t_user_ids, keys=self.keys,
+                 last_seen=self.last_seen, edge_i=self.edge_i.astype(np.int32), edge_j=self.edge_j.astype(np.int32),
+                 edge_weight=self.edge_weight.astype(np.int8))
+        os.replace(tmp_file, self.path)
+
+    def pairs(self, table: CandidateTable) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Admissible pairs i < j of the table rows with weights, in the order of admissible_pairs.
+        Updates the cache with the current queue and saves it.
+        """
+        if not self.loaded:
+            self.load()
+        now = time.time()
+        n = len(table)
+        keys = profile_keys(table.roles, table.formats, table.interests, table.places)
+
+        # Вершины нового кэша: текущая очередь, затем недавно ушедшие из неё пользователи
+        cached_index = {t_user_id: k for k, t_user_id in enumerate(self.t_user_ids.tolist())}
+        old_position = np.fromiter((cached_index.get(t_user_id, -1) for t_user_id in table.t_user_ids.tolist()),
+                                   dtype=np.int64, count=n)
+        in_queue = np.zeros(len(self.t_user_ids), dtype=bool)
+        in_queue[old_position[old_position >= 0]] = True
+        retained = np.flatnonzero(~in_queue & (now - self.last_seen <= self.max_age))
+        old_position = np.concatenate([old_position, retained])
+        keys = np.concatenate([keys, self.keys[retained]])
+        last_seen = np.concatenate([np.full(n, now), self.last_seen[retained]])
+        t_user_ids = np.concatenate([table.t_user_ids, self.t_user_ids[retained]])
+        size = len(keys)
+
+        unchanged = old_position >= 0
+        unchanged[unchanged] = self.keys[old_position[unchanged]] == keys[unchanged]
+
+        # Рёбра между неизменившимися вершинами переносятся из старого кэша
+        to_new = np.full(len(self.t_user_ids), -1, dtype=np.int64)
+        to_new[old_position[unchanged]] = np.flatnonzero(unchanged)
+        new_i, new_j = to_new[self.edge_i], to_new[self.edge_j]
+        reused = (new_i >= 0) & (new_j >= 0)
+        parts_i, parts_j = [np.minimum(new_i[reused], new_j[reused])], [np.maximum(new_i[reused], new_j[reused])]
+        parts_weight = [self.edge_weight[reused]]
+
+        # Изменившиеся и новые сравниваются со всеми, пара двух изменившихся берётся один раз
+        changed = np.flatnonzero(~unchanged)
+        roles, formats, interests, places = unpack_keys(keys)
+        for start in range(0, len(changed), ROWS_CHUNK):
+            rows = changed[start:start + ROWS_CHUNK]
+            mask = admissible_mask(roles[rows], formats[rows], places[rows], roles, formats, places)
+            mask &= unchanged[None, :] | (np.arange(size)[None, :] > rows[:, None])
+            r, columns = np.nonzero(mask)
+            parts_i.append(np.minimum(rows[r], columns))
+            parts_j.append(np.maximum(rows[r], columns))
+            parts_weight.append(pair_weights(interests, rows[r], columns))
+        edge_i, edge_j, edge_weight = np.concatenate(parts_i), np.concatenate(parts_j), np.concatenate(parts_weight)
+
+        self.t_user_ids, self.keys, self.last_seen = t_user_ids, keys, last_seen
+        self.edge_i, self.edge_j, self.edge_weight = edge_i, edge_j, edge_weight
+        self.save()
+        self.stats = {'pair_cache_changed': len(changed), 'pair_cache_reused_edges': int(reused.sum()),
+                      'pair_cache_vertices': size, 'pair_cache_edges': len(edge_i)}
+
+        current = (edge_i < n) & (edge_j < n)
+        edge_i, edge_j, edge_weight = edge_i[current], edge_j[current], edge_weight[current]
+        order = np.argsort(edge_i * n + edge_j, kind='stable')
+        return edge_i[order], edge_j[order], edge_weight[order]
@@ -0,0 +1,93 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from matcher.models.Criterion import Criterion, Interest, MeetingFormat, PreferredPlaces
+from matcher.models.MatchingFeatures import MatchingFeatures
+from matcher.models.MyUser import MyUser, Role
+
+INTEREST_BITS = {interest: 1 << k for k, interest in enumerate(Interest)}
+PLACE_BITS = {place: 1 << k for k, place in enumerate(PreferredPlaces)}
+FORMAT_CODES = {meeting_format: k for k, meeting_format in enumerate(MeetingFormat)}
+ROLE_CODES = {role: k for k, role in enumerate(Role)}
+# Самые узкие типы, в которые помещаются битовые маски
+INTEREST_DTYPE = np.uint16 if len(Interest) <= 16 else np.int64
+PLACE_DTYPE = np.uint8 if len(PreferredPlaces) <= 8 else np.int64
+
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(1 << len(Interest))], dtype=np.int64)
+
+FORBIDDEN, ALLOWED, NEED_COMMON_PLACE = 0, 1, 2
+
+# FORMAT_RULES[format1, format2] - можно ли встретиться при данных форматах встречи
+FORMAT_RULES = np.full((len(MeetingFormat), len(MeetingFormat)), NEED_COMMON_PLACE, dtype=np.int8)
+FORMAT_RULES[FORMAT_CODES[MeetingFormat.ONLINE], :] = ALLOWED
+FORMAT_RULES[:, FORMAT_CODES[MeetingFormat.ONLINE]] = ALLOWED
+FORMAT_RULES[FORMAT_CODES[MeetingFormat.ONLINE], FORMAT_CODES[MeetingFormat.OFFLINE]] = FORBIDDEN
+FORMAT_RULES[FORMAT_CODES[MeetingFormat.OFFLINE], FORMAT_CODES[MeetingFormat.ONLINE]] = FORBIDDEN
+FORMAT_RULES[FORMAT_CODES[MeetingFormat.ANY], FORMAT_CODES[MeetingFormat.ANY]] = ALLOWED
+
+# Сколько строк матрицы пар считается за раз: ограничивает память O(chunk * n) вместо O(n^2)
+ROWS_CHUNK = 1024
+
+
+def to_mask(items, bits) -> int:
+    mask = 0
+    for item in items:
+        mask |= bits[item]
+    return mask
+
+
+def to_features(t_user_id: int, user_info: dict) -> MatchingFeatures:
+    """Features of a user dict (get_profiles format plus "homies"), the same encoding as matching_features table"""
+    user: MyUser = user_info["user"]
+    criterion: Criterion = user_info["criterion"]
+    return MatchingFeatures(t_user_id=t_user_id,
+                            role=ROLE_CODES[user.role],
+                            meeting_format=FORMAT_CODES[criterion.meeting_format],
+                            interests=to_mask(criterion.interests, INTEREST_BITS),
+                            places=to_mask(criterion.preferred_places, PLACE_BITS),
+                            group_names=tuple(set(group.name for group in user_info["groups"])),
+                            work_names=tuple(set(work.name for work in user_info["works"])),
+                            homies=frozenset(user_info["homies"]))
+
+
+def encode_features(features: List[MatchingFeatures]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Roles, formats, interests and places of the queue as int codes and bitmasks"""
+    roles = np.fromiter((feature.role for feature in features), dtype=np.int8, count=len(features))
+    formats = np.fromiter((feature.meeting_format for feature in features), dtype=np.int8, count=len(features))
+    interests = np.fromiter((feature.interests for feature in features), dtype=INTEREST_DTYPE, count=len(features))
+    places = np.fromiter((feature.places for feature in features), dtype=PLACE_DTYPE, count=len(features))
+    return roles, formats, interests, places
+
+
+def admissible_mask(roles1: np.ndarray, formats1: np.ndarray, places1: np.ndarray,
+                    roles2: np.ndarray, formats2: np.ndarray, places2: np.ndarray) -> np.ndarray:
+    """Matrix of admissible pairs: the first users are rows, the second ones are columns"""
+    same_role = roles1[:, None] == roles2[None, :]
+    rules = FORMAT_RULES[formats1[:, None], formats2[None, :]]
+    common_place = (places1[:, None] & places2[None, :]) != 0
+    return same_role & ((rules == ALLOWED) | ((rules == NEED_COMMON_PLACE) & common_place))
+
+
+def admissible_pairs(roles: np.ndarray, formats: np.ndarray, places: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """All pairs i < j with the same role, compatible meeting format and, where needed, a common place"""
+    n = len(formats)
+    rows_i, rows_j = [], []
+    for start in range(0, n, ROWS_CHUNK):
+        end = min(start + ROWS_CHUNK, n)
+        # Столбцы левее start лежат ниже диагонали и уже посчитаны предыдущими блоками
+        rows, columns = slice(start, end), slice(start, n)
+        mask = admissible_mask(roles[rows], formats[rows], places[rows], roles[columns], formats[columns],
+                               places[columns])
+        mask &= np.arange(start, n)[None, :] > np.arange(start, end)[:, None]
+        i, j = np.nonzero(mask)
+        rows_i.append(i + start)
+        rows_j.append(j + start)
+    if not rows_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows_i), np.concatenate(rows_j)
+
+
+def pair_weights(interests: np.ndarray, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+    """Number of common interests + 1 for every pair"""
+    return POPCOUNT[interests[i] & interests[j]] + 1
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+from matcher.opb_model.CandidateTable import CandidateTable
+from matcher.opb_model.CompatibilityGraph import CompatibilityGraph, GraphComponent
+from matcher.opb_model.greedy import greedy_matching, GREEDY_GAP
+from matcher.opb_model.pair_cache import PairCache
+from matcher.opb_model.selected_edges import matching_from_pairs, pairs_from_mate
+from matcher.opb_model.solvers import get_solver
+from matcher.utils.run_metrics import RunMetrics
+
+# Меньше секунды SCIP не успевает даже построить модель
+MIN_COMPONENT_TIME_LIMIT = 1.0
+# Не BotLogger: модуль импортируется и в процессах решателя, где алерты не нужны
+logger = logging.getLogger(__name__)
+
+
+def solve_component(solver_name: str, component: GraphComponent, deadline: float, gap_limit: float):
+    # Функция верхнего уровня, чтобы её можно было отправить в дочерний процесс
+    task = get_solver(solver_name)(None, graph=component)
+    # Компоненты из очереди пула стартуют позже, поэтому бюджет считается от общего дедлайна
+    free_users, matching = task.solve(
+        time_limit=max(deadline - time.time(), MIN_COMPONENT_TIME_LIMIT), gap_limit=gap_limit)
+    return free_users, matching, task.gap, task.stats
+
+
+def merge_results(free_users: List[int], results, metrics: RunMetrics | None) \
+        -> Tuple[List[int], List[Tuple[int, int]], float]:
+    matching = []
+    gap = 0.0
+    for component_free_users, component_matching, component_gap, component_stats in results:
+        if metrics is not None:
+            # Времена компонент суммируются, при параллельном решении это процессорное, а не настенное время
+            metrics.add_solver_stats(component_stats)
+        free_users.extend(component_free_users)
+        matching.extend(component_matching)
+        # Относительный зазор суммы не больше наибольшего зазора слагаемых
+        gap = max(gap, component_gap)
+    return free_users, matching, gap
+
+
+def build_components(table: CandidateTable, pair_cache: PairCache | None = None) \
+        -> Tuple[CompatibilityGraph, List[GraphComponent], List[int]]:
+    graph = CompatibilityGraph(table, pair_cache)
+    components, free_users = graph.components()
+    components.sort(key=lambda component: len(component.t_user_ids), reverse=True)
+    return graph, components, free_users
+
+
+def solve_greedy(component: GraphComponent):
+    mate = greedy_matching(len(component.t_user_ids), component.edges)
+    free_users, matching = matching_from_pairs(component.t_user_ids, pairs_from_mate(mate))
+    return free_users, matching, GREEDY_GAP, dict()
+
+
+def kill_workers(executor: ProcessPoolExecutor):
+    # У ProcessPoolExecutor нет публичного способа прервать уже запущенную задачу
+    for process in list((executor._processes or {}).values()):
+        process.kill()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def solve_by_components(table: CandidateTable, solver_name: str, workers: int, time_limit: float,
+                              gap_limit: float, grace: float, metrics: RunMetrics | None = None,
+                              pair_cache: PairCache | None = None) \
+        -> Tuple[List[int], List[Tuple[int, int]], float]:
+    """
+    Pairs never cross components of the compatibility graph (different roles, campuses without a common place),
+    so every component is an independent problem. Components are solved in worker processes, largest first,
+    all of them within time_limit seconds, and the event loop stays free meanwhile.
+    Workers get a GraphComponent and return plain lists, numbers and a stats dict.
+    SCIP cannot stop inside the root LP and may overrun time_limit, so the hard wall-clock budget
+    is time_limit + grace: workers still running then are killed, their components and components
+    whose worker failed get the greedy matching. Returns free users, matching and the proven relative gap.
+    """
+    deadline = time.time() + time_limit
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    graph, components, free_users = await loop.run_in_executor(None, build_components, table, pair_cache)
+    if metrics is not None:
+        metrics.phases['graph_build'] += time.perf_counter() - start
+        metrics.set('graph_vertices', len(graph.t_user_ids))
+        metrics.set('graph_edges', len(graph.edges))
+        metrics.set('components', len(components))
+        if pair_cache is not None:
+            for name, value in pair_cache.stats.items():
+                metrics.set(name, value)
+    if not components:
+        return free_users, [], 0.0
+
+    # spawn: форк процесса с потоками (логгер, пул потоков asyncio) может унаследовать захваченные блокировки
+    executor = ProcessPoolExecutor(max_workers=max(1, min(workers, len(components))),
+                                   mp_context=multiprocessing.get_context('spawn'))
+    futures = [loop.run_in_executor(executor, solve_component, solver_name, component, deadline, gap_limit)
+               for component in components]
+    try:
+        done, pending = await asyncio.wait(futures, timeout=max(deadline - time.time(), 0) + grace)
+    except BaseException:
+        kill_workers(executor)
+        raise
+    if pending:
+        kill_workers(executor)
+        if metrics is not None:
+            metrics.set('components_timed_out', len(pending))
+    else:
+        executor.shutdown(wait=False)
+
+    failed = [future for future in done if future.exception() is not None]
+    for future in failed:
+        logger.error('solver worker failed', exc_info=future.exception())
+    if failed and metrics is not None:
+        metrics.set('components_failed', len(failed))
+
+    results = []
+    for component, future in zip(components, futures):
+        if future in done and future not in failed:
+            results.append(future.result())
+        else:
+            # Ошибка решателя не должна срывать запуск: next_matching уже сдвинут
+            future.cancel()
+            results.append(await loop.run_in_executor(None, solve_greedy, component))
+    return merge_results(free_users, results, metrics)
@@ -0,0 +1,19 @@
+from typing import List, Sequence, Tuple
+
+
+def matching_from_pairs(t_user_ids: Sequence[int], pairs: List[Tuple[int, int]]) \
+        -> Tuple[List[int], List[Tuple[int, int]]]:
+    """Free users and matching of t_user_ids from selected vertex pairs, O(n)"""
+    used = [False] * len(t_user_ids)
+    matching = []
+    for i, j in pairs:
+        assert not used[i], "t_user_ids[i] already in used"
+        assert not used[j], "t_user_ids[j] already in used"
+        used[i] = used[j] = True
+        matching.append((t_user_ids[i], t_user_ids[j]))
+    free_users = [t_user_id for k, t_user_id in enumerate(t_user_ids) if not used[k]]
+    return free_users, matching
+
+
+def pairs_from_mate(mate: List[int]) -> List[Tuple[int, int]]:
+    return [(i, j) for i, j in enumerate(mate) if j > i]
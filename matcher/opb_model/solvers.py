@@ -0,0 +1,14 @@
+import importlib
+
+# Бэкенды импортируются лениво, чтобы blossom работал и без установленного pyscipopt
+SOLVERS = {
+    'scip': ('matcher.opb_model.OpbTask', 'OpbTask'),
+    'blossom': ('matcher.opb_model.BlossomTask', 'BlossomTask'),
+}
+
+
+def get_solver(name: str):
+    if name not in SOLVERS:
+        raise ValueError(f"unknown solver = {name}, expected one of {list(SOLVERS.keys())}")
+    module_name, class_name = SOLVERS[name]
+    return getattr(importlib.import_module(module_name), class_name)
@@ -1,40 +1,38 @@
 from asyncpg import Connection, Record
-from typeguard import check_type
 
 from matcher.models.IsuData import IsuData
 from matcher.models.MyUser import Sex
+from matcher.repositorys.decoding import check_columns
+
+ISUDATA_COLUMNS = 't_user_id, sub, gender, name, isu, preferred_username, given_name, middle_name, family_name, ' \
+                  'email, email_verified, is_student, is_worker'
+
+ISUDATA_COLUMN_TYPES = {'t_user_id': int, 'sub': str, 'gender': str, 'name': str, 'isu': int | None,
+                        'preferred_username': str, 'given_name': str, 'middle_name': str | None,
+                        'family_name': str, 'email': str, 'email_verified': bool, 'is_student': bool,
+                        'is_worker': bool}
 
 
 def _get_my_isudata(isudata: Record) -> IsuData | None:
     if not isudata:
         return None
-    check_type('t_user_id', isudata['t_user_id'], int)
-    check_type('sub', isudata['sub'], str)
-    check_type('gender', isudata['gender'], str)
-    check_type('name', isudata['name'], str)
-    check_type('isu', isudata.get('isu'), int | None)
-    check_type('preferred_username', isudata['preferred_username'], str)
-    check_type('given_name', isudata['given_name'], str)
-    check_type('middle_name', isudata.get('middle_name'), str | None)
-    check_type('family_name', isudata['family_name'], str)
-    check_type('email', isudata['email'], str)
-    check_type('email_verified', isudata['email_verified'], bool)
-    check_type('is_student', isudata['is_student'], bool)
-    check_type('is_worker', isudata['is_worker'], bool)
+    check_columns(isudata, ISUDATA_COLUMN_TYPES)
+    t_user_id, sub, gender, name, isu, preferred_username, given_name, middle_name, family_name, \
+        email, email_verified, is_student, is_worker = isudata
     return IsuData(
-        t_user_id = isudata['t_user_id'],
-        sub = isudata['sub'],
-        gender = Sex.MEN if isudata['gender'] == "male" else Sex.WOMEN,
-        name = isudata['name'],
-        isu = isudata.get('isu'),
-        preferred_username = isudata['preferred_username'],
-        given_name = isudata['given_name'],
-        middle_name = isudata.get('middle_name'),
-        family_name = isudata['family_name'],
-        email = isudata['email'],
-        email_verified = isudata['email_verified'],
-        is_student = isudata['is_student'],
-        is_worker = isudata['is_worker']
+        t_user_id = t_user_id,
+        sub = sub,
+        gender = Sex.MEN if gender == "male" else Sex.WOMEN,
+        name = name,
+        isu = isu,
+        preferred_username = preferred_username,
+        given_name = given_name,
+        middle_name = middle_name,
+        family_name = family_name,
+        email = email,
+        email_verified = email_verified,
+        is_student = is_student,
+        is_worker = is_worker
     )
 
 class ConfirmIsudataRepo:
@@ -43,8 +41,8 @@ class ConfirmIsudataRepo:
 
     async def get_isu_data(self, t_user_id):
         return _get_my_isudata(await self.conn.fetchrow(
-            """
-            SELECT *
+            f"""
+            SELECT {ISUDATA_COLUMNS}
             FROM confirm_isudata
             WHERE t_user_id=$1
             """,
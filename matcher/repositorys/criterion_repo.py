@@ -3,19 +3,28 @@ from typing import List
 from asyncpg import Connection
 
 from matcher.models.Criterion import Criterion, MeetingFormat, Interest, PreferredPlaces
+from matcher.repositorys.decoding import enum_lookup, decode_enums, check_columns
 
+CRITERION_COLUMNS = 't_user_id, interests, meeting_format, preferred_places'
+
+CRITERION_COLUMN_TYPES = {'t_user_id': int, 'interests': List[str] | None, 'meeting_format': str,
+                          'preferred_places': List[str] | None}
+
+INTERESTS = enum_lookup(Interest)
+MEETING_FORMATS = enum_lookup(MeetingFormat)
+PREFERRED_PLACES = enum_lookup(PreferredPlaces)
 
-def skipp_empty(array):
-    return filter(lambda a: a != '', array)
 
 def _get_criterion(criterion):
     if not criterion:
         return None
+    check_columns(criterion, CRITERION_COLUMN_TYPES)
+    t_user_id, interests, meeting_format, preferred_places = criterion
     return Criterion(
-        t_user_id=criterion['t_user_id'],
-        interests=list(map(lambda interest: Interest(interest), skipp_empty(criterion['interests']))),
-        meeting_format=MeetingFormat(criterion['meeting_format']),
-        preferred_places=list(map(lambda preferred_place: PreferredPlaces(preferred_place), skipp_empty(criterion['preferred_places'])))
+        t_user_id=t_user_id,
+        interests=decode_enums(INTERESTS, interests),
+        meeting_format=MEETING_FORMATS[meeting_format],
+        preferred_places=decode_enums(PREFERRED_PLACES, preferred_places)
     )
 
 def _get_criterions(criterions) -> List[Criterion]:
@@ -47,4 +56,9 @@ class CriterionRepo:
             list(map(lambda x: x.value, criterion.preferred_places))) == 'INSERT 0 1'
 
     async def get_criterion_by_t_user_id(self, t_user_id: int) -> Criterion | None:
-        return _get_criterion(await self.conn.fetchrow('SELECT * FROM criterion WHERE t_user_id=$1', t_user_id))
+        return _get_criterion(await self.conn.fetchrow(
+            f'SELECT {CRITERION_COLUMNS} FROM criterion WHERE t_user_id=$1', t_user_id))
+
+    async def get_criterions_by_t_user_ids(self, t_user_ids: List[int]) -> List[Criterion]:
+        return _get_criterions(await self.conn.fetch(
+            f'SELECT {CRITERION_COLUMNS} FROM criterion WHERE t_user_id = ANY($1)', t_user_ids))
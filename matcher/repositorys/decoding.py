@@ -0,0 +1,27 @@
+from enum import Enum
+from typing import Dict, Iterable, List, Type, TypeVar
+
+from typeguard import check_type
+
+from matcher.configs.general_bot_config import DEBUG_TYPE_CHECKS
+
+E = TypeVar('E', bound=Enum)
+
+
+def enum_lookup(enum_type: Type[E]) -> Dict[str, E]:
+    # Поиск в словаре в разы быстрее, чем вызов конструктора перечисления на каждую строку
+    return {member.value: member for member in enum_type}
+
+
+def decode_enums(lookup: Dict[str, E], values: Iterable[str] | None) -> List[E]:
+    """Array column to enum members, empty strings are skipped"""
+    if not values:
+        return []
+    return [lookup[value] for value in values if value != '']
+
+
+def check_columns(record, types: Dict[str, type]):
+    """Runtime type check of decoded columns, only in debug mode ([debug] type_checks)"""
+    if DEBUG_TYPE_CHECKS:
+        for column, expected_type in types.items():
+            check_type(record[column], expected_type)
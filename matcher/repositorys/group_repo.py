@@ -1,4 +1,5 @@
-from typing import List
+from collections import defaultdict
+from typing import List, Dict
 
 from asyncpg import Connection
 
@@ -18,6 +19,13 @@ def _get_groups(groups) -> List[Group]:
     return [_get_group(group) for group in groups]
 
 
+def _get_groups_by_t_user_id(groups) -> Dict[int, List[Group]]:
+    groups_by_t_user_id = defaultdict(list)
+    for group in groups:
+        groups_by_t_user_id[group['isudata_id']].append(_get_group(group))
+    return groups_by_t_user_id
+
+
 class GroupRepo:
     """Db abstraction layer"""
 
@@ -29,3 +37,9 @@ class GroupRepo:
             'SELECT name, course, faculty_name, qualification_name  '
             'FROM confirm_isudata_groups inner join confirm_group on confirm_isudata_groups.group_id = confirm_group.name '
             'WHERE isudata_id = $1', t_user_id))
+
+    async def get_groups_by_t_user_ids(self, t_user_ids: List[int]) -> Dict[int, List[Group]]:
+        return _get_groups_by_t_user_id(await self.conn.fetch(
+            'SELECT isudata_id, name, course, faculty_name, qualification_name  '
+            'FROM confirm_isudata_groups inner join confirm_group on confirm_isudata_groups.group_id = confirm_group.name '
+            'WHERE isudata_id = ANY($1)', t_user_ids))
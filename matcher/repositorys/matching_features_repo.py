@@ -0,0 +1,135 @@
+from datetime import datetime
+from typing import Callable, FrozenSet, List
+
+from asyncpg import Connection
+
+from matcher.models.Criterion import Interest, MeetingFormat, PreferredPlaces
+from matcher.models.MatchingFeatures import MatchingFeatures
+from matcher.models.MyUser import Role
+from matcher.repositorys.triggers import create_trigger_if_missing
+
+# Коды и биты в базе - позиции значений в этих массивах, тот же порядок, что и в pair_scoring
+ROLE_VALUES = [role.value for role in Role]
+FORMAT_VALUES = [meeting_format.value for meeting_format in MeetingFormat]
+INTEREST_VALUES = [interest.value for interest in Interest]
+PLACE_VALUES = [place.value for place in PreferredPlaces]
+
+# Таблицы, из которых собираются признаки, и колонка с t_user_id в каждой из них
+INVALIDATING_TABLES = [('users', 't_user_id'), ('criterion', 't_user_id'),
+                       ('confirm_isudata_groups', 'isudata_id'), ('confirm_isudata_work_places', 'isudata_id')]
+
+
+def _get_features(row, get_homies: Callable[[int], FrozenSet[int]]) -> MatchingFeatures:
+    t_user_id, role, meeting_format, interests, places, group_names, work_names = row
+    return MatchingFeatures(t_user_id=t_user_id,
+                            role=role,
+                            meeting_format=meeting_format,
+                            interests=interests,
+                            places=places,
+                            group_names=tuple(group_names),
+                            work_names=tuple(work_names),
+                            homies=get_homies(t_user_id))
+
+
+class MatchingFeaturesRepo:
+    """Db abstraction layer"""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    async def create_table(self):
+        # Денормализованные признаки матчинга: запись профиля удаляет строку триггером,
+        # матчер пересчитывает удалённые строки при загрузке очереди, а не весь профиль на каждом запуске
+        await self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS matching_features (
+                t_user_id bigint PRIMARY KEY,
+                role smallint NOT NULL,
+                meeting_format smallint NOT NULL,
+                interests int NOT NULL,
+                places int NOT NULL,
+                group_names text[] NOT NULL,
+                work_names text[] NOT NULL,
+                updated_at timestamp NOT NULL DEFAULT now());
+            """)
+        # Профили пишет бот, поэтому устаревшие строки помечаются триггерами, а не кодом репозиториев
+        await self.conn.execute(
+            """
+            CREATE OR REPLACE FUNCTION invalidate_matching_features() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP <> 'INSERT' THEN
+                    DELETE FROM matching_features WHERE t_user_id = (to_jsonb(OLD) ->> TG_ARGV[0])::bigint;
+                END IF;
+                IF TG_OP <> 'DELETE' THEN
+                    DELETE FROM matching_features WHERE t_user_id = (to_jsonb(NEW) ->> TG_ARGV[0])::bigint;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """)
+        for table, user_column in INVALIDATING_TABLES:
+            await create_trigger_if_missing(
+                self.conn, table, f'{table}_matching_features',
+                f"""
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION invalidate_matching_features('{user_column}')
+                """)
+
+    async def refresh(self, t_user_ids: List[int] | None = None):
+        """Recomputes features of the given users (all users if None) from users, criterion, groups and workplaces"""
+        await self.conn.execute(
+            """
+            INSERT INTO matching_features(
+                t_user_id, role, meeting_format,
+                interests, places,
+                group_names, work_names, updated_at)
+            SELECT users.t_user_id,
+                   array_position($2::text[], users.role) - 1,
+                   array_position($3::text[], criterion.meeting_format) - 1,
+                   (SELECT coalesce(bit_or(1 << (array_position($4::text[], interest) - 1)), 0)
+                    FROM unnest(criterion.interests) AS interest),
+                   (SELECT coalesce(bit_or(1 << (array_position($5::text[], place) - 1)), 0)
+                    FROM unnest(criterion.preferred_places) AS place),
+                   ARRAY(SELECT DISTINCT confirm_group.name
+                         FROM confirm_isudata_groups
+                            INNER JOIN confirm_group ON confirm_isudata_groups.group_id = confirm_group.name
+                         WHERE confirm_isudata_groups.isudata_id = users.t_user_id),
+                   ARRAY(SELECT DISTINCT confirm_workplace.name
+                         FROM confirm_isudata_work_places
+                            INNER JOIN confirm_workplace
+                                ON confirm_isudata_work_places.workplace_id = confirm_workplace.id
+                         WHERE confirm_isudata_work_places.isudata_id = users.t_user_id),
+                   now()
+            FROM users INNER JOIN criterion ON criterion.t_user_id = users.t_user_id
+            WHERE $1::bigint[] IS NULL OR users.t_user_id = ANY($1::bigint[])
+            ON CONFLICT(t_user_id) DO UPDATE SET
+                (role, meeting_format, interests, places, group_names, work_names, updated_at)
+                    =
+                (excluded.role, excluded.meeting_format, excluded.interests, excluded.places,
+                excluded.group_names, excluded.work_names, excluded.updated_at);
+            """,
+            t_user_ids, ROLE_VALUES, FORMAT_VALUES, INTEREST_VALUES, PLACE_VALUES)
+
+    async def refresh_missing(self, next_matching: datetime) -> List[int]:
+        """Computes features of waiting users that have none: new users and users whose profile changed"""
+        t_user_ids = [row['t_user_id'] for row in await self.conn.fetch(
+            """
+            SELECT waiting_companions.t_user_id
+            FROM waiting_companions
+                LEFT JOIN matching_features ON matching_features.t_user_id = waiting_companions.t_user_id
+            WHERE waiting_companions.matching_time <= $1 AND matching_features.t_user_id IS NULL
+            """, next_matching)]
+        if t_user_ids:
+            await self.refresh(t_user_ids)
+        return t_user_ids
+
+    async def get_queue_features(self, next_matching: datetime,
+                                 get_homies: Callable[[int], FrozenSet[int]]) -> List[MatchingFeatures]:
+        """Features of users waiting for the matching, one scan of waiting_companions joined by primary key"""
+        return [_get_features(row, get_homies) for row in await self.conn.fetch(
+            """
+            SELECT matching_features.t_user_id, role, meeting_format, interests, places, group_names, work_names
+            FROM waiting_companions
+                INNER JOIN matching_features ON matching_features.t_user_id = waiting_companions.t_user_id
+            WHERE waiting_companions.matching_time <= $1
+            """, next_matching)]
@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 from asyncpg import Connection
 
 
@@ -40,4 +42,23 @@ class MeetingRepo:
                 FROM row) RETURNING id;""",
             first_user_id, second_user_id)
 
+    async def add_meetings(self, pairs: List[Tuple[int, int]]) -> List[int]:
+        """Inserts both rows of every meeting in one statement, returns meeting ids in the order of pairs"""
+        if not pairs:
+            return []
+        pairs = [(min(first, second), max(first, second)) for first, second in pairs]
+        rows = await self.conn.fetch(
+            """with pairs as (
+                    SELECT first_user_id, second_user_id
+                    FROM unnest($1::bigint[], $2::bigint[]) AS p(first_user_id, second_user_id)),
+                first_rows as (
+                    INSERT INTO meetings (t_user_id, time_matching)
+                    SELECT first_user_id, now() FROM pairs RETURNING id, t_user_id)
+                INSERT INTO meetings (id, t_user_id, time_matching) (
+                SELECT first_rows.id, pairs.second_user_id, now()
+                FROM first_rows INNER JOIN pairs ON pairs.first_user_id = first_rows.t_user_id) RETURNING id, t_user_id;""",
+            [first for first, _ in pairs], [second for _, second in pairs])
+        meeting_ids = {row['t_user_id']: row['id'] for row in rows}
+        return [meeting_ids[second] for _, second in pairs]
+
 
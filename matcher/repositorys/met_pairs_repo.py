@@ -0,0 +1,67 @@
+from typing import List, Tuple
+
+from asyncpg import Connection
+
+from matcher.repositorys.triggers import create_trigger_if_missing
+
+
+def _get_pairs(rows) -> List[Tuple[int, int]]:
+    return [(row['first_user_id'], row['second_user_id']) for row in rows]
+
+
+class MetPairsRepo:
+    """Db abstraction layer"""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    async def create_table(self):
+        # Пары, которые уже встречались: одна строка на пару, first_user_id < second_user_id
+        await self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS met_pairs (
+                first_user_id bigint NOT NULL,
+                second_user_id bigint NOT NULL,
+                meeting_id int NOT NULL,
+                seq bigserial NOT NULL,
+                PRIMARY KEY (first_user_id, second_user_id));
+            CREATE INDEX IF NOT EXISTS met_pairs_seq_idx ON met_pairs (seq);
+            """)
+        # Отзывы пишет бот, поэтому пара добавляется триггером на feedbacks, а не кодом матчера
+        await self.conn.execute(
+            """
+            CREATE OR REPLACE FUNCTION add_met_pair() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO met_pairs (first_user_id, second_user_id, meeting_id)
+                SELECT least(NEW.t_user_id, t_user_id), greatest(NEW.t_user_id, t_user_id), id
+                FROM meetings
+                WHERE id = NEW.meeting_id AND t_user_id <> NEW.t_user_id
+                ON CONFLICT DO NOTHING;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """)
+        await create_trigger_if_missing(
+            self.conn, 'feedbacks', 'feedbacks_met_pairs',
+            """
+            AFTER INSERT OR UPDATE OF is_meeting_took_place ON feedbacks
+            FOR EACH ROW WHEN (NEW.is_meeting_took_place)
+            EXECUTE FUNCTION add_met_pair()
+            """)
+
+    async def backfill(self):
+        """Builds pairs of all confirmed meetings in one statement, already known pairs are skipped"""
+        await self.conn.execute(
+            """
+            INSERT INTO met_pairs (first_user_id, second_user_id, meeting_id)
+            SELECT least(feedbacks.t_user_id, meetings.t_user_id),
+                   greatest(feedbacks.t_user_id, meetings.t_user_id),
+                   feedbacks.meeting_id
+            FROM feedbacks INNER JOIN meetings
+                ON meetings.id = feedbacks.meeting_id AND meetings.t_user_id <> feedbacks.t_user_id
+            WHERE feedbacks.is_meeting_took_place = true
+            ON CONFLICT DO NOTHING
+            """)
+
+    async def get_pairs(self) -> List[Tuple[int, int]]:
+        return _get_pairs(await self.conn.fetch('SELECT first_user_id, second_user_id FROM met_pairs'))
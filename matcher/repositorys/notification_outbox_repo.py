@@ -0,0 +1,87 @@
+from typing import List
+
+from asyncpg import Connection
+
+from matcher.models.Notification import Notification, NotificationKind
+
+
+def _get_notification(row) -> Notification:
+    return Notification(
+        id=row['id'],
+        t_user_id=row['t_user_id'],
+        kind=NotificationKind(row['kind']),
+        text=row['text'],
+        new_state=row['new_state'],
+        meeting_id=row['meeting_id'],
+        attempts=row['attempts'])
+
+
+def _get_notifications(rows) -> List[Notification]:
+    return [_get_notification(row) for row in rows]
+
+
+class NotificationOutboxRepo:
+    """Db abstraction layer"""
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+
+    async def create_table(self):
+        await self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS matching_notifications (
+                id bigserial PRIMARY KEY,
+                t_user_id bigint NOT NULL,
+                kind text NOT NULL,
+                text text NOT NULL,
+                new_state text NOT NULL,
+                meeting_id bigint,
+                created_at timestamp NOT NULL DEFAULT now(),
+                claimed_until timestamp,
+                sent_at timestamp,
+                attempts int NOT NULL DEFAULT 0,
+                last_error text);
+            CREATE INDEX IF NOT EXISTS matching_notifications_pending_idx
+                ON matching_notifications (id) WHERE sent_at IS NULL;
+            """)
+
+    async def add_notifications(self, notifications: List[Notification]):
+        if not notifications:
+            return
+        await self.conn.execute(
+            """
+            INSERT INTO matching_notifications (t_user_id, kind, text, new_state, meeting_id)
+            SELECT * FROM unnest($1::bigint[], $2::text[], $3::text[], $4::text[], $5::bigint[])
+            """,
+            [notification.t_user_id for notification in notifications],
+            [notification.kind.value for notification in notifications],
+            [notification.text for notification in notifications],
+            [notification.new_state for notification in notifications],
+            [notification.meeting_id for notification in notifications])
+
+    async def claim_pending(self, limit: int, lease_seconds: float, max_attempts: int) -> List[Notification]:
+        """Takes a batch of unsent notifications for lease_seconds, so concurrent workers never share a row"""
+        return _get_notifications(await self.conn.fetch(
+            """
+            UPDATE matching_notifications
+            SET claimed_until = now() + $2 * interval '1 second', attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM matching_notifications
+                WHERE sent_at IS NULL AND attempts < $3 AND (claimed_until IS NULL OR claimed_until < now())
+                ORDER BY id
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED)
+            RETURNING *
+            """, limit, lease_seconds, max_attempts))
+
+    async def mark_sent(self, ids: List[int]):
+        await self.conn.execute(
+            'UPDATE matching_notifications SET sent_at = now(), claimed_until = NULL WHERE id = ANY($1)', ids)
+
+    async def mark_failed(self, notification_id: int, error: str, retry_delay: float):
+        await self.conn.execute(
+            "UPDATE matching_notifications SET claimed_until = now() + $3 * interval '1 second', last_error = $2 "
+            "WHERE id = $1", notification_id, error, retry_delay)
+
+    async def count_pending(self) -> int:
+        return await self.conn.fetchval('SELECT count(*) FROM matching_notifications WHERE sent_at IS NULL')
@@ -0,0 +1,11 @@
+from asyncpg import Connection
+
+
+async def create_trigger_if_missing(conn: Connection, table: str, name: str, definition: str):
+    """
+    CREATE TRIGGER takes a lock on a live table of the bot, so the trigger is created only once:
+    on later starts the check in pg_trigger is all that runs
+    """
+    if await conn.fetchval('SELECT 1 FROM pg_trigger WHERE tgrelid = $1::regclass AND tgname = $2', table, name):
+        return
+    await conn.execute(f'CREATE TRIGGER {name} {definition}')
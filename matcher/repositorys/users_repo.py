@@ -1,41 +1,39 @@
 from typing import List
 
 from asyncpg import Connection, Record
-from typeguard import check_type
 
 from matcher.models.MyUser import MyUser, Sex, Role
+from matcher.repositorys.decoding import enum_lookup, check_columns
+
+# Порядок колонок совпадает с порядком полей MyUser
+USER_COLUMNS = 't_user_id, email, full_name, sex, user_name, user_info, ban, is_student, is_worker, role, old_user'
+
+USER_COLUMN_TYPES = {'t_user_id': int, 'email': str, 'full_name': str, 'sex': str, 'user_name': str,
+                     'user_info': str, 'ban': bool, 'is_student': bool, 'is_worker': bool, 'role': str,
+                     'old_user': bool}
+
+SEXES = enum_lookup(Sex)
+ROLES = enum_lookup(Role)
 
 
 def _get_my_user(user: Record) -> MyUser | None:
     if not user:
         return None
-    check_type(user['t_user_id'], int)
-    check_type(user['email'], str)
-    check_type(user['full_name'], str)
-    check_type(Sex(user['sex']), Sex)
-    check_type(user['user_name'], str)
-    # check_type('direction', Direction(user['direction']), Direction)
-    # check_type('course', Course(user['course']), Course)
-    check_type(user['user_info'], str)
-    check_type(user['ban'], bool)
-    check_type(user['is_student'], bool)
-    check_type(user['is_worker'], bool)
-    check_type(Role(user['role']), Role)
-    check_type(user['old_user'], bool)
-
-    return MyUser(t_user_id=user['t_user_id'],
-                  email=user['email'],
-                  full_name=user['full_name'],
-                  sex=Sex(user['sex']),
-                  user_name=user['user_name'],
+    check_columns(user, USER_COLUMN_TYPES)
+    t_user_id, email, full_name, sex, user_name, user_info, ban, is_student, is_worker, role, old_user = user
+    return MyUser(t_user_id=t_user_id,
+                  email=email,
+                  full_name=full_name,
+                  sex=SEXES[sex],
+                  user_name=user_name,
                   # direction=Direction(user['direction']),
                   # course=Course(user['course']),
-                  user_info=user['user_info'],
-                  ban=user['ban'],
-                  is_student=user['is_student'],
-                  is_worker=user['is_worker'],
-                  role=Role(user['role']),
-                  old_user=user['old_user'])
+                  user_info=user_info,
+                  ban=ban,
+                  is_student=is_student,
+                  is_worker=is_worker,
+                  role=ROLES[role],
+                  old_user=old_user)
 
 
 def _get_my_users(users: list[Record]) -> List[MyUser]:
@@ -49,10 +47,14 @@ class UserRepo:
         self.conn = conn
 
     async def get_by_email(self, email) -> MyUser | None:
-        return _get_my_user(await self.conn.fetchrow('SELECT * FROM users WHERE email=$1', email))
+        return _get_my_user(await self.conn.fetchrow(f'SELECT {USER_COLUMNS} FROM users WHERE email=$1', email))
 
     async def get_by_t_user_id(self, t_user_id) -> MyUser | None:
-        return _get_my_user(await self.conn.fetchrow('SELECT * FROM users WHERE t_user_id=$1', t_user_id))
+        return _get_my_user(await self.conn.fetchrow(f'SELECT {USER_COLUMNS} FROM users WHERE t_user_id=$1', t_user_id))
+
+    async def get_by_t_user_ids(self, t_user_ids: List[int]) -> List[MyUser]:
+        return _get_my_users(await self.conn.fetch(
+            f'SELECT {USER_COLUMNS} FROM users WHERE t_user_id = ANY($1)', t_user_ids))
 
     async def upsert(self, my_user: MyUser) -> bool:
         return await self.conn.execute(
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List
 
 from asyncpg import Connection
 
@@ -29,6 +30,19 @@ class WaitingCompanionRepo:
             """,
         t_user_id, matching_time) == 'INSERT 0 1'
 
+    async def upsert_users_in_queue(self, t_user_ids: List[int], matching_time: datetime):
+        await self.conn.execute(
+            """
+            INSERT INTO waiting_companions(
+                 t_user_id, matching_time)
+            SELECT t_user_id, $2 FROM unnest($1::bigint[]) AS t_user_id
+            ON CONFLICT(t_user_id) DO UPDATE SET
+                (t_user_id, matching_time) 
+                    = 
+                (excluded.t_user_id,excluded.matching_time);
+            """,
+        t_user_ids, matching_time)
+
     async def delete_user_from_queue(self, t_user_id: int) -> bool:
         return await self.conn.execute(
             """
@@ -36,6 +50,13 @@ class WaitingCompanionRepo:
                WHERE t_user_id=$1
             """, t_user_id) == 'DELETE 1'
 
+    async def delete_users_from_queue(self, t_user_ids: List[int]):
+        await self.conn.execute(
+            """
+            DELETE FROM waiting_companions 
+               WHERE t_user_id = ANY($1)
+            """, t_user_ids)
+
     async def get_matching_time_by_t_user_id(self, t_user_id) -> datetime:
         return _get_matching_time(await self.conn.fetchrow(
             """
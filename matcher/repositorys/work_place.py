@@ -1,4 +1,5 @@
-from typing import List
+from collections import defaultdict
+from typing import List, Dict
 
 from asyncpg import Connection
 
@@ -15,6 +16,12 @@ def _get_work_place(work_place) -> WorkPlace:
 def _get_work_places(work_places) -> List[WorkPlace]:
     return [_get_work_place(work_place) for work_place in work_places]
 
+def _get_work_places_by_t_user_id(work_places) -> Dict[int, List[WorkPlace]]:
+    work_places_by_t_user_id = defaultdict(list)
+    for work_place in work_places:
+        work_places_by_t_user_id[work_place['isudata_id']].append(_get_work_place(work_place))
+    return work_places_by_t_user_id
+
 
 class WorkPlaceRepo:
     """Db abstraction layer"""
@@ -27,3 +34,9 @@ class WorkPlaceRepo:
             'SELECT confirm_workplace.id as id, name, short_name  '
             'FROM confirm_isudata_work_places inner join confirm_workplace on confirm_isudata_work_places.workplace_id = confirm_workplace.id '
             'WHERE isudata_id = $1', t_user_id))
+
+    async def get_work_places_by_t_user_ids(self, t_user_ids: List[int]) -> Dict[int, List[WorkPlace]]:
+        return _get_work_places_by_t_user_id(await self.conn.fetch(
+            'SELECT isudata_id, confirm_workplace.id as id, name, short_name  '
+            'FROM confirm_isudata_work_places inner join confirm_workplace on confirm_isudata_work_places.workplace_id = confirm_workplace.id '
+            'WHERE isudata_id = ANY($1)', t_user_ids))
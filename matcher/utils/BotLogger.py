@@ -1,7 +1,9 @@
 import asyncio
 import logging
+import re
 import time
 from functools import wraps
+from typing import Dict, List
 
 from aiogram import Bot, types, Dispatcher
 from aiogram.dispatcher import FSMContext
@@ -9,20 +11,97 @@ from aiogram.dispatcher import FSMContext
 # Создаем бота для алярмов
 from aiogram.types import User
 
-from matcher.configs.general_bot_config import ALARM_BOT_TOKEN, CHAT_ID_ALARM, CHAT_ID_ALARM_WITH_HR
+from matcher.configs.general_bot_config import ALARM_BOT_TOKEN, CHAT_ID_ALARM, CHAT_ID_ALARM_WITH_HR, \
+    ALERT_WINDOW, ALERT_MAX_GROUPS
+from matcher.configs.log_config import LOG_STRUCTURED, LOG_TO_CONSOLE
+
+# Лимит Telegram на длину одного сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+
+class AlertQueue:
+    """
+    Errors for the alarm chat are not sent right away: a background flusher sends one summary per window,
+    identical errors (up to numbers, e.g. user ids) are grouped with a counter.
+    """
+
+    def __init__(self, window: float, max_groups: int):
+        self.window = window
+        self.max_groups = max_groups
+        self.groups: Dict[str, List] = {}
+        self.flusher: asyncio.Task | None = None
+        self.bot: Bot | None = None
+
+    def put(self, message: str):
+        key = re.sub(r'\d+', '#', message)
+        if key in self.groups:
+            self.groups[key][1] += 1
+        else:
+            self.groups[key] = [message, 1]
+        if self.flusher is None or self.flusher.done():
+            try:
+                self.flusher = asyncio.get_running_loop().create_task(self._flush_periodically())
+            except RuntimeError:
+                # Нет event loop: сообщение уйдёт со следующим флашем
+                pass
+
+    async def _flush_periodically(self):
+        while self.groups:
+            await asyncio.sleep(self.window)
+            await self.flush()
+
+    def _summary(self) -> str:
+        groups, self.groups = self.groups, {}
+        total = sum(count for _, count in groups.values())
+        lines = [f"{total} errors in the last {self.window:.0f} c:"]
+        for message, count in list(groups.values())[:self.max_groups]:
+            lines.append(f"[x{count}] {message}")
+        if len(groups) > self.max_groups:
+            lines.append(f"... and {len(groups) - self.max_groups} more kinds of errors, see logs")
+        return '\n'.join(lines)[:MAX_MESSAGE_LENGTH]
+
+    async def flush(self):
+        if not self.groups:
+            return
+        summary = self._summary()
+        if self.bot is None:
+            self.bot = Bot(token=ALARM_BOT_TOKEN)
+        try:
+            await self.bot.send_message(CHAT_ID_ALARM, summary)
+            await self.bot.send_message(CHAT_ID_ALARM, "https://www.youtube.com/watch?v=sjakGpdgWUw")
+        except Exception:
+            # Через print_error нельзя: ошибка отправки снова попала бы в очередь
+            logging.getLogger(__name__).exception("can't send alert summary")
+
+    async def close(self):
+        if self.flusher is not None:
+            self.flusher.cancel()
+        await self.flush()
+        if self.bot is not None:
+            session = await self.bot.get_session()
+            await session.close()
+
+
+alerts = AlertQueue(ALERT_WINDOW, ALERT_MAX_GROUPS)
 
 
 class BotLogger(logging.LoggerAdapter):
+    """
+    Messages support lazy %-formatting: print_info("user %s", t_user_id) is formatted only if the record is written.
+    In structured mode the current user is not looked up in Dispatcher/FSM storage.
+    """
 
     def __init__(self, name: str, extra=None, with_user_info: bool = True):
         super().__init__(logging.getLogger(name), extra or {})
         self.alarm_bot: Bot = Bot(token=ALARM_BOT_TOKEN)
-        self.with_user_info = with_user_info
+        self.with_user_info = with_user_info and not LOG_STRUCTURED
 
     async def _get_current_user_info(self) -> str:
+        if not self.with_user_info:
+            return ""
         user: types.User = types.User.get_current()
         dispatcher = Dispatcher.get_current()
-        if dispatcher and user and self.with_user_info:
+        if dispatcher and user:
             state: FSMContext = dispatcher.current_state()
             data: dict = await state.get_data()
             state_str = await state.get_state()
@@ -30,27 +109,42 @@ class BotLogger(logging.LoggerAdapter):
         else:
             return ""
 
-    async def print_warning(self, message: str, stacklevel: int = 4):
-        message = message + " " + (await self._get_current_user_info())
-        print(f'\033[0;33;40m[WARNING]: {message} \033[0;0m')
-        self.warning(message, stacklevel=stacklevel)
-
-    async def print_error(self, message: str, stacklevel: int = 4):
-        message = message + " " + (await self._get_current_user_info())
-        print(f'\033[0;31;40m[ERROR]: {message} \033[0;0m')
-        self.error(message, exc_info=True, stacklevel=stacklevel)
-
-        await self.alarm_bot.send_message(CHAT_ID_ALARM, message)
-        await self.alarm_bot.send_message(CHAT_ID_ALARM, "https://www.youtube.com/watch?v=sjakGpdgWUw")
-
-    async def print_info(self, message: str, stacklevel: int = 4):
-        message = message + " " + (await self._get_current_user_info())
-        print(f'\033[0;34m[INFO]: {message} \033[0;0m')
-        self.info(message, stacklevel=stacklevel)
-
-    async def print_dev(self, message: str):
-        message = message + " " + (await self._get_current_user_info())
-        print(f'\033[0;36m[DEV]: {message} \033[0;0m')
+    async def _with_user_info(self, message: str, args: tuple) -> str:
+        user_info = await self._get_current_user_info()
+        if not user_info:
+            return message
+        # Данные пользователя не должны участвовать в %-форматировании
+        return message + " " + (user_info.replace('%', '%%') if args else user_info)
+
+    @staticmethod
+    def _console(color: str, level: str, message: str, args: tuple):
+        if LOG_TO_CONSOLE:
+            print(f'\033[{color}m[{level}]: {message % args if args else message} \033[0;0m')
+
+    async def print_warning(self, message: str, *args, stacklevel: int = 4):
+        if not self.isEnabledFor(logging.WARNING):
+            return
+        message = await self._with_user_info(message, args)
+        self._console('0;33;40', 'WARNING', message, args)
+        self.warning(message, *args, stacklevel=stacklevel)
+
+    async def print_error(self, message: str, *args, stacklevel: int = 4):
+        message = await self._with_user_info(message, args)
+        self._console('0;31;40', 'ERROR', message, args)
+        self.error(message, *args, exc_info=True, stacklevel=stacklevel)
+
+        alerts.put(message % args if args else message)
+
+    async def print_info(self, message: str, *args, stacklevel: int = 4):
+        if not self.isEnabledFor(logging.INFO):
+            return
+        message = await self._with_user_info(message, args)
+        self._console('0;34', 'INFO', message, args)
+        self.info(message, *args, stacklevel=stacklevel)
+
+    async def print_dev(self, message: str, *args):
+        message = await self._with_user_info(message, args)
+        self._console('0;36', 'DEV', message, args)
 
     async def send_matching_info(self, cnt_students, cnt_workers, cnt_students_matching, cnt_workers_matching,
                                  cnt_free_students, cnt_free_workers):
@@ -96,12 +190,14 @@ def logging_decorator_factory(logger: BotLogger):
     def logging_decorator(function_to_decorate):
         @wraps(function_to_decorate)
         async def a_wrapper_accepting_arbitrary_arguments(*args, **kwargs):
-            start = time.time()
-            await logger.print_info(f"start execution {function_to_decorate.__name__}, execution start time = {start}")
+            if not logger.isEnabledFor(logging.INFO):
+                return await function_to_decorate(*args, **kwargs)
+            start = time.perf_counter()
+            await logger.print_info("start execution %s, execution start time = %s",
+                                    function_to_decorate.__name__, time.time())
             res = await function_to_decorate(*args, **kwargs)
-            end = time.time()
-            delta = end - start
-            await logger.print_info(f"finish execution {function_to_decorate.__name__}, execution time = {delta}")
+            await logger.print_info("finish execution %s, execution time = %s",
+                                    function_to_decorate.__name__, time.perf_counter() - start)
             return res
 
         return a_wrapper_accepting_arbitrary_arguments
@@ -0,0 +1,92 @@
+import json
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+# Сколько раз перечитываем состояние, если бот успел изменить его между чтением и записью
+UPDATE_ATTEMPTS = 5
+
+
+def _key(t_user_id: int, part: str) -> str:
+    # Ключи RedisStorage2 бота: чат и пользователь в личке совпадают
+    return f'fsm:{t_user_id}:{t_user_id}:{part}'
+
+
+def _load_data(data: str | None) -> dict:
+    return json.loads(data) if data else {}
+
+
+class FsmStorage:
+    """Async access to the bot FSM data and state in redis"""
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    async def get(self, t_user_id: int) -> Tuple[dict, str | None]:
+        data, state = await self.redis.mget(_key(t_user_id, 'data'), _key(t_user_id, 'state'))
+        return _load_data(data), state
+
+    async def set(self, t_user_id: int, data: dict, state: str):
+        await self.set_many({t_user_id: (data, state)})
+
+    async def get_many(self, t_user_ids: List[int]) -> Dict[int, Tuple[dict, str | None]]:
+        if not t_user_ids:
+            return {}
+        keys = []
+        for t_user_id in t_user_ids:
+            keys.append(_key(t_user_id, 'data'))
+            keys.append(_key(t_user_id, 'state'))
+        values = await self.redis.mget(keys)
+        return {t_user_id: (_load_data(values[2 * k]), values[2 * k + 1]) for k, t_user_id in enumerate(t_user_ids)}
+
+    async def set_many(self, states: Dict[int, Tuple[dict, str]]):
+        if not states:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for t_user_id, (data, state) in states.items():
+                pipe.set(_key(t_user_id, 'data'), json.dumps(data))
+                pipe.set(_key(t_user_id, 'state'), state)
+            await pipe.execute()
+
+
+    async def update(self, t_user_id: int, change: Callable[[dict], Awaitable[dict]], state: str):
+        """
+        Read-modify-write of data and state in one transaction: keys are watched, so if the bot
+        writes them after the read, change is applied again to the new data instead of overwriting it
+        """
+        data_key, state_key = _key(t_user_id, 'data'), _key(t_user_id, 'state')
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for attempt in range(UPDATE_ATTEMPTS):
+                try:
+                    await pipe.watch(data_key, state_key)
+                    data = await change(_load_data(await pipe.get(data_key)))
+                    pipe.multi()
+                    pipe.set(data_key, json.dumps(data))
+                    pipe.set(state_key, state)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    if attempt == UPDATE_ATTEMPTS - 1:
+                        raise
+
+
+class FsmBatch:
+    """
+    FSM data of many users read with one MGET before delivery.
+    Writes go per user right after the user's messages are sent, see FsmStorage.update
+    """
+
+    def __init__(self, storage: FsmStorage, states: Dict[int, Tuple[dict, str | None]]):
+        self.storage = storage
+        self.states = states
+
+    @staticmethod
+    async def load(storage: FsmStorage, t_user_ids: List[int]) -> 'FsmBatch':
+        return FsmBatch(storage, await storage.get_many(t_user_ids))
+
+    def get_data(self, t_user_id: int) -> dict:
+        return self.states[t_user_id][0]
+
+    async def update(self, t_user_id: int, change: Callable[[dict], Awaitable[dict]], state: str):
+        await self.storage.update(t_user_id, change, state)
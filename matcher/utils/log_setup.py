@@ -0,0 +1,51 @@
+import atexit
+import json
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+
+from matcher.configs.log_config import LOG_LEVEL, LOG_FILEMODE, LOG_FILENAME, LOG_FORMAT, LOG_STRUCTURED
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {'time': self.formatTime(record),
+                 'level': record.levelname,
+                 'logger': record.name,
+                 'func': record.funcName,
+                 'line': record.lineno,
+                 'message': record.getMessage()}
+        if record.exc_info and record.exc_info[0] is not None:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    # Стандартный QueueHandler форматирует запись в вызывающем потоке,
+    # здесь запись уходит как есть и форматируется в потоке QueueListener
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging() -> QueueListener:
+    """Log calls only put records into a queue, a listener thread writes them to the file"""
+    file_handler = logging.FileHandler(LOG_FILENAME, mode=LOG_FILEMODE, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter() if LOG_STRUCTURED else logging.Formatter(LOG_FORMAT))
+
+    queue = SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(DeferredQueueHandler(queue))
+
+    listener = QueueListener(queue, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: QueueListener):
+    # Дописываем оставшиеся в очереди записи, если listener ещё не остановлен вручную
+    if listener._thread is not None:
+        listener.stop()
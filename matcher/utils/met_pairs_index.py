@@ -0,0 +1,34 @@
+from collections import defaultdict
+from typing import Dict, FrozenSet, Set
+
+from asyncpg import Connection
+
+from matcher.repositorys.met_pairs_repo import MetPairsRepo
+
+
+class MetPairsIndex:
+    """
+    In-memory index of pairs that have already met, re-read from met_pairs on every queue load.
+    Reading only rows after the last seen seq would miss rows committed late with a smaller seq,
+    and the table is small: one row per confirmed meeting.
+    """
+
+    def __init__(self):
+        self.partners: Dict[int, Set[int]] = defaultdict(set)
+
+    async def build(self, conn: Connection):
+        repo = MetPairsRepo(conn)
+        await repo.create_table()
+        await repo.backfill()
+        await self.refresh(conn)
+
+    async def refresh(self, conn: Connection):
+        partners = defaultdict(set)
+        for first_user_id, second_user_id in await MetPairsRepo(conn).get_pairs():
+            partners[first_user_id].add(second_user_id)
+            partners[second_user_id].add(first_user_id)
+        self.partners = partners
+
+    def homies(self, t_user_id: int) -> FrozenSet[int]:
+        # Копия, чтобы обновление индекса не меняло уже загруженную очередь
+        return frozenset(self.partners.get(t_user_id, ()))
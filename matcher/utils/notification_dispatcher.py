@@ -0,0 +1,104 @@
+import asyncio
+import time
+from typing import Awaitable, Dict, Iterable, List
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter
+
+from matcher.utils.BotLogger import BotLogger
+
+logger = BotLogger(__name__, with_user_info=False)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def block(self, seconds: float):
+        # Telegram прислал flood wait: никто не отправляет, пока он не истечёт
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """
+    Sends notifications concurrently while respecting Telegram limits:
+    a global token bucket for the bot, a token bucket per chat and retry after flood wait errors.
+    """
+
+    def __init__(self, bot: Bot, concurrency: int, global_rate: float, per_chat_rate: float, max_retries: int):
+        self.bot = bot
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.max_retries = max_retries
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return self.chat_buckets[chat_id]
+
+    async def call(self, chat_id: int, method, *args, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                return await method(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                await logger.print_warning("flood wait %s c for chat %s, attempt = %s", e.timeout, chat_id, attempt + 1)
+                self.global_bucket.block(e.timeout)
+
+    def limited(self, chat_id: int) -> 'LimitedBot':
+        return LimitedBot(self.bot, self, chat_id)
+
+    async def _guarded(self, job: Awaitable):
+        async with self.semaphore:
+            return await job
+
+    async def run(self, jobs: Iterable[Awaitable]) -> List:
+        return await asyncio.gather(*(self._guarded(job) for job in jobs), return_exceptions=True)
+
+
+class LimitedBot:
+    """Bot proxy: every API coroutine goes through the dispatcher limits of one chat"""
+
+    def __init__(self, bot: Bot, dispatcher: NotificationDispatcher, chat_id: int):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.chat_id = chat_id
+
+    def __getattr__(self, name):
+        method = getattr(self.bot, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+
+        async def limited_method(*args, **kwargs):
+            return await self.dispatcher.call(self.chat_id, method, *args, **kwargs)
+
+        return limited_method
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import List
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from asyncpg import Pool
+
+from matcher.models.Notification import Notification, NotificationKind
+from matcher.repositorys.notification_outbox_repo import NotificationOutboxRepo
+from matcher.utils.BotLogger import BotLogger
+from matcher.utils.delete_button import delete_button_on_previous_message
+from matcher.utils.fsm_storage import FsmStorage, FsmBatch
+from matcher.utils.notification_dispatcher import NotificationDispatcher
+from matcher.utils.run_metrics import MetricsExporter
+from matcher.utils.save_message import save_sending_message_attribute
+
+logger = BotLogger(__name__, with_user_info=False)
+
+ADVISE_MESSAGE = "Если не знаешь, что написать собеседнику, то отправь это сообщение:\n\nПривет!\nБот @itmoffee_bot сказал, что мы коллеги. Удобно договориться о встрече сегодня или завтра?"
+
+
+def edit_profile_buttons() -> InlineKeyboardMarkup:
+    buttons = InlineKeyboardMarkup()
+    buttons.add(InlineKeyboardButton(text="Редактировать профиль", callback_data='edit_profile'))
+    return buttons
+
+
+def start_approve_buttons() -> InlineKeyboardMarkup:
+    buttons = InlineKeyboardMarkup()
+    buttons.add(InlineKeyboardButton(text='Супер, понятно', callback_data='confirm'))
+    return buttons
+
+
+async def delete_and_change_state_message(bot, message, fsm: FsmBatch, t_user_id: int, new_state: str):
+    await delete_button_on_previous_message(bot, fsm.get_data(t_user_id))
+    # Состояние пишется сразу после отправки: пользователь может нажать кнопку нового сообщения
+    await fsm.update(t_user_id, lambda json_data: save_sending_message_attribute(message, json_data), new_state)
+
+
+async def send_notification(bot, notification: Notification):
+    if notification.kind == NotificationKind.MISMATCHED:
+        return await bot.send_message(notification.t_user_id, notification.text, reply_markup=edit_profile_buttons())
+    # TODO тут была проблемма со смайликами, пришлось их удалить
+    await bot.send_message(notification.t_user_id, notification.text, parse_mode='Markdown')
+    return await bot.send_message(notification.t_user_id, ADVISE_MESSAGE, reply_markup=start_approve_buttons())
+
+
+class OutboxWorker:
+    """
+    Delivers notifications saved in the outbox together with the matching result.
+    A row is marked as sent only after delivery, so after a restart the worker continues
+    from the first undelivered notification (at-least-once delivery).
+    """
+
+    def __init__(self, pool: Pool, dispatcher: NotificationDispatcher, fsm_storage: FsmStorage,
+                 batch_size: int, poll_interval: float, lease_seconds: float, max_attempts: int,
+                 metrics: MetricsExporter | None = None):
+        self.pool = pool
+        self.dispatcher = dispatcher
+        self.fsm_storage = fsm_storage
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.metrics = metrics
+        self.wake_event = asyncio.Event()
+
+    def wake(self):
+        self.wake_event.set()
+
+    async def _deliver(self, fsm: FsmBatch, notification: Notification):
+        bot = self.dispatcher.limited(notification.t_user_id)
+        message = await send_notification(bot, notification)
+        try:
+            await delete_and_change_state_message(bot, message, fsm, notification.t_user_id, notification.new_state)
+        except Exception as e:
+            # Сообщение уже доставлено: ошибка redis не должна вернуть уведомление в очередь и задублировать его
+            await logger.print_error("outbox: state of user %s is not saved after delivery: %s",
+                                     notification.t_user_id, e)
+
+    async def drain_batch(self) -> int:
+        async with self.pool.acquire() as conn:
+            notifications: List[Notification] = await NotificationOutboxRepo(conn).claim_pending(
+                self.batch_size, self.lease_seconds, self.max_attempts)
+        if not notifications:
+            return 0
+
+        start = time.perf_counter()
+        fsm = await FsmBatch.load(self.fsm_storage, list({n.t_user_id for n in notifications}))
+        results = await self.dispatcher.run(self._deliver(fsm, n) for n in notifications)
+
+        sent = []
+        abandoned = 0
+        async with self.pool.acquire() as conn:
+            repo = NotificationOutboxRepo(conn)
+            for notification, result in zip(notifications, results):
+                if isinstance(result, Exception):
+                    await logger.print_error("outbox: error with user %s, attempt = %s: %s",
+                                             notification.t_user_id, notification.attempts, result)
+                    await repo.mark_failed(notification.id, str(result), self.poll_interval)
+                    if notification.attempts >= self.max_attempts:
+                        # Строка больше не будет выбрана claim_pending
+                        abandoned += 1
+                        await logger.print_error("outbox: notification %s for user %s abandoned after %s attempts",
+                                                 notification.id, notification.t_user_id, notification.attempts)
+                else:
+                    sent.append(notification.id)
+            await repo.mark_sent(sent)
+        if self.metrics is not None:
+            self.metrics.record_delivery(len(sent), len(notifications) - len(sent), time.perf_counter() - start,
+                                         abandoned)
+        return len(notifications)
+
+    async def drain(self):
+        while await self.drain_batch():
+            pass
+
+    async def run(self):
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                await logger.print_error("outbox: unexpected error: %s", e)
+            try:
+                await asyncio.wait_for(self.wake_event.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake_event.clear()
@@ -0,0 +1,130 @@
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict
+
+QUERY_METHODS = ('execute', 'executemany', 'fetch', 'fetchrow', 'fetchval')
+
+
+class RunMetrics:
+    """Timings of phases and counters of one matching run"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.queries: Dict[str, int] = defaultdict(int)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] += time.perf_counter() - start
+
+    def inc(self, name: str, value: float = 1):
+        self.counters[name] += value
+
+    def set(self, name: str, value: float):
+        self.counters[name] = value
+
+    def add_solver_stats(self, stats: Dict[str, float]):
+        for name, value in stats.items():
+            self.inc(f"solver_{name}", value)
+
+    def instrument(self, conn) -> 'InstrumentedConnection':
+        return InstrumentedConnection(conn, self)
+
+    def to_dict(self) -> dict:
+        return {'started_at': self.started_at.isoformat(),
+                'phases': dict(self.phases),
+                'counters': dict(self.counters),
+                'queries': dict(self.queries)}
+
+
+class InstrumentedConnection:
+    """Connection proxy: counts queries by the repo class (or function) that sends them"""
+
+    def __init__(self, conn, metrics: RunMetrics):
+        self.conn = conn
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        attribute = getattr(self.conn, name)
+        if name not in QUERY_METHODS:
+            return attribute
+
+        def counted(*args, **kwargs):
+            caller = sys._getframe(1)
+            owner = caller.f_locals.get('self')
+            self.metrics.queries[type(owner).__name__ if owner is not None else caller.f_code.co_name] += 1
+            return attribute(*args, **kwargs)
+
+        return counted
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+class MetricsExporter:
+    """
+    Keeps the last run and cumulative delivery counters of the process.
+    Prometheus text format is rewritten atomically for the node_exporter textfile collector,
+    every run is appended to a JSON lines file.
+    """
+
+    def __init__(self, prometheus_file: str, runs_file: str):
+        self.prometheus_file = prometheus_file
+        self.runs_file = runs_file
+        self.last_run: RunMetrics | None = None
+        self.delivery: Dict[str, float] = defaultdict(float)
+
+    def record_run(self, metrics: RunMetrics):
+        self.last_run = metrics
+        with open(self.runs_file, 'a') as f:
+            f.write(json.dumps(metrics.to_dict()) + '\n')
+        self.write_prometheus()
+
+    def record_delivery(self, sent: int, failed: int, seconds: float, abandoned: int = 0):
+        self.delivery['sent'] += sent
+        self.delivery['failed'] += failed
+        self.delivery['abandoned'] += abandoned
+        self.delivery['seconds'] += seconds
+        self.write_prometheus()
+
+    def render(self) -> str:
+        lines = [
+            '# TYPE matcher_notifications_sent_total counter',
+            f"matcher_notifications_sent_total {self.delivery['sent']}",
+            '# TYPE matcher_notifications_failed_total counter',
+            f"matcher_notifications_failed_total {self.delivery['failed']}",
+            '# TYPE matcher_notifications_abandoned_total counter',
+            f"matcher_notifications_abandoned_total {self.delivery['abandoned']}",
+            '# TYPE matcher_notifications_delivery_seconds_total counter',
+            f"matcher_notifications_delivery_seconds_total {self.delivery['seconds']}",
+        ]
+        if self.last_run is not None:
+            lines.append('# TYPE matcher_last_run_timestamp_seconds gauge')
+            lines.append(f"matcher_last_run_timestamp_seconds {self.last_run.started_at.timestamp()}")
+            lines.append('# TYPE matcher_run_phase_seconds gauge')
+            for name, seconds in self.last_run.phases.items():
+                lines.append(f"matcher_run_phase_seconds{_labels(phase=name)} {seconds}")
+            lines.append('# TYPE matcher_run_value gauge')
+            for name, value in self.last_run.counters.items():
+                lines.append(f"matcher_run_value{_labels(name=name)} {value}")
+            lines.append('# TYPE matcher_run_queries gauge')
+            for repo, count in self.last_run.queries.items():
+                lines.append(f"matcher_run_queries{_labels(repo=repo)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self):
+        tmp_file = self.prometheus_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_file, self.prometheus_file)
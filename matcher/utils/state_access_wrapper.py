@@ -23,6 +23,6 @@ async def get_attr_from_state_with_default(state: FSMContext, attribute: str, de
 
 
 async def set_attr_to_state(state: FSMContext, attribute: str, value: str | dict | int | None):
-    await logger.print_info(f"set state attribute = {attribute}, value = {value}")
+    await logger.print_info("set state attribute = %s, value = %s", attribute, value)
     async with state.proxy() as data:
         data[attribute] = value